@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""Micro-benchmarks for the keylib AES engines."""
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Callable, Sequence
+
+import keylib
+
+
+def time_per_item(func: Callable[[], object], count: int, repeat: int = 3) -> float:
+    """Best-of-`repeat` wall time of `func()` in microseconds per item."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best / count * 1e6
+
+
+def bench_bitsliced(sizes: Sequence[int]) -> int:
+    """Compare the bitsliced engine with the scalar T-table loop per batch size."""
+    schedule = keylib.KeySchedule(os.urandom(16))
+    crossover = None
+    print(f"{'blocks':>8} {'ttable us/blk':>14} {'bitsliced us/blk':>17}")
+    for size in sizes:
+        blocks = [os.urandom(16) for _ in range(size)]
+        schedules = [schedule] * size
+        scalar = time_per_item(lambda: keylib.aes_encrypt_blocks(schedule, blocks, "ttable"), size)
+        sliced = time_per_item(lambda: keylib.aes_encrypt_blocks_bitsliced(schedules, blocks),
+                               size)
+        if crossover is None and sliced < scalar:
+            crossover = size
+        print(f"{size:>8} {scalar:>14.2f} {sliced:>17.2f}")
+    if crossover is None:
+        print("bitsliced never beat the scalar path in this range")
+    else:
+        print(f"bitsliced wins from {crossover} blocks per batch")
+    return 0
+
+
+def bench_backends(batch: int) -> int:
+    """Known-answer status plus single-block and batch speed for every backend."""
+    schedules = [keylib.KeySchedule(os.urandom(16)) for _ in range(16)]
+    blocks = [os.urandom(16) for _ in range(batch)]
+    batch_schedules = [schedules[i % len(schedules)] for i in range(batch)]
+    print(f"{'backend':>12} {'check':>10} {'single us/blk':>14} {'batch us/blk':>13}")
+    for name, backend in keylib.AES_BACKENDS.items():
+        failure = keylib.check_aes_backend(backend)
+        if failure:
+            print(f"{name:>12} {'skipped':>10}  {failure}")
+            continue
+        single = keylib.benchmark_aes_backend(backend)
+        bulk = time_per_item(lambda: backend.encrypt_blocks(batch_schedules, blocks), batch)
+        print(f"{name:>12} {'ok':>10} {single:>14.2f} {bulk:>13.2f}")
+    print(f"default: {keylib.select_aes_backend().describe()}")
+    return 0
+
+
+def bench_mac(samples: int) -> int:
+    """Verify the MAC-specialized path bit-for-bit against the general one, then time both."""
+    schedules = [keylib.KeySchedule(os.urandom(16)) for _ in range(64)]
+    seeds = [os.urandom(5) for _ in range(samples)]
+    pairs = [(schedules[i % len(schedules)], seed) for i, seed in enumerate(seeds)]
+    for schedule, seed in pairs:
+        general = keylib.encrypt_words_ttable(schedule.words, keylib.MAC_BLOCK_PREFIX + seed)[:5]
+        if keylib.encrypt_mac_ttable(schedule, seed) != general:
+            print(f"MISMATCH key={schedule.key.hex()} seed={seed.hex()}")
+            return 1
+    general_us = time_per_item(lambda: [
+        keylib.encrypt_words_ttable(schedule.words, keylib.MAC_BLOCK_PREFIX + seed)[:5]
+        for schedule, seed in pairs], samples)
+    special_us = time_per_item(lambda: [keylib.encrypt_mac_ttable(schedule, seed)
+                                        for schedule, seed in pairs], samples)
+    print(f"{samples} MACs match the general path")
+    print(f"general {general_us:.2f} us/MAC, specialized {special_us:.2f} us/MAC")
+    return 0
+
+
+def bench_fused(samples: int) -> int:
+    """Per-MAC cost of the generic, compiled and fused tiers, and where each pays off."""
+    schedule = keylib.KeySchedule(os.urandom(16))
+    seeds = [os.urandom(5) for _ in range(samples)]
+    start = time.perf_counter()
+    compiled_mac = keylib.compile_key_functions(schedule)[1]
+    compile_cost = (time.perf_counter() - start) * 1e6
+    start = time.perf_counter()
+    fused_mac = keylib.compile_fused_functions(schedule)[1]
+    fused_cost = (time.perf_counter() - start) * 1e6
+    for seed in seeds:
+        expected = keylib.encrypt_mac_ttable(schedule, seed)
+        if compiled_mac(seed) != expected or fused_mac(seed) != expected:
+            print(f"MISMATCH key={schedule.key.hex()} seed={seed.hex()}")
+            return 1
+    generic = time_per_item(lambda: [keylib.encrypt_mac_ttable(schedule, seed)
+                                     for seed in seeds], samples)
+    compiled = time_per_item(lambda: [compiled_mac(seed) for seed in seeds], samples)
+    fused = time_per_item(lambda: [fused_mac(seed) for seed in seeds], samples)
+    print(f"{'tier':>9} {'setup us':>10} {'us/MAC':>8} {'break-even MACs vs generic':>27}")
+    print(f"{'generic':>9} {0:>10.0f} {generic:>8.2f} {'-':>27}")
+    for name, setup, cost in (("compiled", compile_cost, compiled), ("fused", fused_cost, fused)):
+        saving = generic - cost
+        breakeven = f"{setup / saving:.0f}" if saving > 0 else "never"
+        print(f"{name:>9} {setup:>10.0f} {cost:>8.2f} {breakeven:>27}")
+    print(f"fused tables use ~{keylib.fused_table_bytes() // 1024} KiB per key")
+    return 0
+
+
+def bench_chains(lanes: Sequence[int], steps: int) -> int:
+    """Check the multi-lane SHA-256 kernel against hashlib and time both per hash."""
+    if keylib.load_numpy() is None:
+        print("NumPy is not installed; only the hashlib chain engine is available")
+        return 1
+    print(f"{'lanes':>8} {'hashlib us/hash':>16} {'numpy us/hash':>14}")
+    for count in lanes:
+        secrets = [os.urandom(32) for _ in range(count)]
+        chains = keylib.hash_chains_numpy(secrets, steps)
+        for secret, chain in zip(secrets, chains):
+            if chain[-1] != keylib.hash_forward(secret, steps):
+                print(f"MISMATCH secret={secret.hex()}")
+                return 1
+        scalar = time_per_item(lambda: [keylib.hash_forward(secret, steps)
+                                        for secret in secrets], count * steps)
+        lanewise = time_per_item(lambda: keylib.hash_chains_numpy(secrets, steps),
+                                 count * steps)
+        print(f"{count:>8} {scalar:>16.3f} {lanewise:>14.3f}")
+    return 0
+
+
+def parse_importtime(stderr: str) -> list[tuple[int, str]]:
+    """(cumulative microseconds, module) pairs from ``python -X importtime`` output."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # One separator space, then two more per nesting level.
+        rows.append((int(cumulative), name[1:].rstrip()))
+    return rows
+
+
+# Cold-start budget enforced by ``bench.py startup``; test_startup.py checks imports only.
+STARTUP_RUNS = 15
+STARTUP_BUDGET_MS = 50.0
+
+
+def bench_startup(runs: int = STARTUP_RUNS, budget_ms: float = STARTUP_BUDGET_MS) -> int:
+    """Time cold ``keygen.py`` runs and fail when the median exceeds the budget."""
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "keygen.py")
+    command = [sys.executable, script, "--seed", "8CE7D1FD06", "--algo", "0x87"]
+    env = {key: value for key, value in os.environ.items()
+           if key not in (keylib.AES_BACKEND_ENV, keylib.DERIVATION_TABLE_ENV)}
+    profile = subprocess.run([sys.executable, "-X", "importtime"] + command[1:], env=env,
+                             capture_output=True, text=True, check=True)
+    imports = parse_importtime(profile.stderr)
+    top_level = [(micros, name) for micros, name in imports if not name.startswith(" ")]
+    print("slowest top-level imports (cumulative):")
+    for micros, name in sorted(top_level, reverse=True)[:8]:
+        print(f"{micros / 1000:>8.1f} ms  {name.strip()}")
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, env=env, capture_output=True, check=True)
+        samples.append((time.perf_counter() - start) * 1000)
+    median = statistics.median(samples)
+    print(f"cold keygen.py: median {median:.1f} ms over {runs} runs "
+          f"(min {min(samples):.1f}, budget {budget_ms:.0f})")
+    if median > budget_ms:
+        print("FAIL: startup is over budget")
+        return 1
+    return 0
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    """Entry point for the benchmark script."""
+    parser = argparse.ArgumentParser(description="Benchmark keylib AES engines")
+    commands = parser.add_subparsers(dest="command", required=True)
+    bitsliced = commands.add_parser("bitsliced", help="Find the batch size where bitslicing wins")
+    bitsliced.add_argument("--sizes", type=lambda text: [int(part) for part in text.split(",")],
+                           default=[1, 4, 16, 32, 64, 128, 256, 1024, 4096],
+                           help="Comma-separated batch sizes (default: %(default)s)")
+    backends = commands.add_parser("backends", help="Check and time every AES backend")
+    backends.add_argument("--batch", type=int, default=1024,
+                          help="Blocks per batch call, spread over 16 keys (default: %(default)s)")
+    mac = commands.add_parser("mac", help="Verify and time the MAC-specialized T-table path")
+    mac.add_argument("--samples", type=int, default=5000,
+                     help="Random (key, seed) pairs to check (default: %(default)s)")
+    fused = commands.add_parser("fused", help="Compare generic, compiled and fused-table tiers")
+    fused.add_argument("--samples", type=int, default=20000,
+                       help="MACs per measurement (default: %(default)s)")
+    chains = commands.add_parser("chains", help="Compare hashlib and multi-lane NumPy SHA-256")
+    chains.add_argument("--lanes", type=lambda text: [int(part) for part in text.split(",")],
+                        default=[256, 4096, 65536],
+                        help="Comma-separated chain counts (default: %(default)s)")
+    chains.add_argument("--steps", type=int, default=10,
+                        help="Chain steps per lane (default: %(default)s)")
+    startup = commands.add_parser("startup", help="Fail if cold keygen.py exceeds a time budget")
+    startup.add_argument("--runs", type=int, default=STARTUP_RUNS,
+                         help="Cold processes to time (default: %(default)s)")
+    startup.add_argument("--budget-ms", type=float, default=STARTUP_BUDGET_MS,
+                         help="Allowed median wall time in ms (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    if args.command == "bitsliced":
+        return bench_bitsliced(args.sizes)
+    if args.command == "backends":
+        return bench_backends(args.batch)
+    if args.command == "mac":
+        return bench_mac(args.samples)
+    if args.command == "fused":
+        return bench_fused(args.samples)
+    if args.command == "chains":
+        return bench_chains(args.lanes, args.steps)
+    if args.command == "startup":
+        return bench_startup(args.runs, args.budget_ms)
+    return 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -6,7 +6,7 @@ from typing import Callable
 
 from PyQt5 import QtCore, QtGui, QtWidgets
 
-from keylib import derive_key_from_algo
+from keylib import DEFAULT_NAMESPACE, derive_key_from_algo, namespaces
 
 
 def normalize_seed(text: str) -> bytes:
@@ -48,6 +48,10 @@ class KeyWidget(QtWidgets.QWidget):
         self.algo_input = QtWidgets.QLineEdit("0x87")
         self.algo_input.setMaxLength(6)
 
+        self.map_input = QtWidgets.QComboBox()
+        self.map_input.addItems(namespaces())
+        self.map_input.setCurrentText(DEFAULT_NAMESPACE)
+
         self.derive_button = QtWidgets.QPushButton("Get Key")
         self.derive_button.clicked.connect(self.handle_derive)
 
@@ -64,6 +68,7 @@ class KeyWidget(QtWidgets.QWidget):
         form = QtWidgets.QFormLayout()
         form.addRow("Seed (hex)", self.seed_input)
         form.addRow("Algorithm", self.algo_input)
+        form.addRow("Platform map", self.map_input)
 
         layout = QtWidgets.QVBoxLayout(self)
         layout.addLayout(form)
@@ -96,7 +101,8 @@ class KeyWidget(QtWidgets.QWidget):
             return
 
         try:
-            mac, iterations, _ = derive_key_from_algo(algo, seed)
+            mac, iterations, _ = derive_key_from_algo(algo, seed,
+                                                      namespace=self.map_input.currentText())
         except ValueError as exc:
             self.show_error(str(exc))
             return
@@ -2,21 +2,45 @@
 """CLI wrapper for the sa015bcr key-derivation utilities."""
 from __future__ import annotations
 
-import argparse
-from typing import Sequence
+import os
+import sys
+import time
 
-from keylib import derive_key_from_algo, derive_key_from_blob
+from keylib import (AES_BACKEND_ENV, AES_BACKENDS, BATCH_REQUEST_MAGIC, BATCH_RESPONSE_MAGIC,
+                    BUFFER_CHUNK_ROWS, PASSWORD_MAP, SEED_REJECT_REASONS, SINGLE_SHOT_BACKEND,
+                    BatchFile, ReloadingPasswordMap, build_derivation_table,
+                    create_batch_responses, derive_batch_file, derive_key_all_algos,
+                    derive_key_from_algo, derive_key_from_blob, derive_keys_batch,
+                    load_password_map_file, parse_password_line, read_batch_requests,
+                    read_batch_responses, read_password_lines, rejection_message,
+                    select_aes_backend, write_batch_requests, write_password_store)
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import Callable, Dict, Iterable, List, Mapping, Sequence, TextIO
+
+    from keylib import DerivationResult
+
+# Separators users put between seed bytes; `parse_seed` strips them.
+SEED_SEPARATORS = str.maketrans("", "", " ,:_")
+
+
+def _argument_error(message: str) -> Exception:
+    """``argparse.ArgumentTypeError(message)``; argparse imports `re`, so it loads on demand."""
+    import argparse
+
+    return argparse.ArgumentTypeError(message)
 
 
 def parse_seed(text: str) -> bytes:
     """Normalize and validate a 5-byte seed from user input."""
-    filtered = ''.join(ch for ch in text if ch not in ' ,:_')
+    filtered = text.translate(SEED_SEPARATORS)
     if len(filtered) != 10:
-        raise argparse.ArgumentTypeError("Seed must be provided as 10 hex digits")
+        raise _argument_error("Seed must be provided as 10 hex digits")
     try:
         return bytes.fromhex(filtered)
     except ValueError as exc:
-        raise argparse.ArgumentTypeError("Seed is not valid hex") from exc
+        raise _argument_error("Seed is not valid hex") from exc
 
 
 def parse_algo(text: str) -> int:
@@ -24,36 +48,839 @@ def parse_algo(text: str) -> int:
     try:
         value = int(text, 0)
     except ValueError as exc:
-        raise argparse.ArgumentTypeError("Algo must be an integer") from exc
+        raise _argument_error("Algo must be an integer") from exc
     if not 0 <= value <= 0xFFFF:
-        raise argparse.ArgumentTypeError("Algo must fit in 16 bits")
+        raise _argument_error("Algo must fit in 16 bits")
     return value
 
 
+def precompute_main(argv: Sequence[str]) -> int:
+    """`keygen.py precompute`: write the mmap-able derivation table."""
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="keygen.py precompute",
+        description="Precompute every (algo, seed tail) key schedule for the built-in map")
+    parser.add_argument("output", help="Table file to write (replaced atomically)")
+    parser.add_argument("--jobs", "-j", type=int, default=None,
+                        help="Worker processes (default: one per CPU)")
+    args = parser.parse_args(argv)
+    if args.jobs is not None and args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    start = time.perf_counter()
+    size = build_derivation_table(args.output, args.jobs)
+    print(f"Wrote {args.output}: {size} bytes in {time.perf_counter() - start:.2f}s")
+    print(f"Use it with KEYLIB_DERIVATION_TABLE={args.output}")
+    return 0
+
+
+def parse_blob_line(text: str) -> tuple[int, str]:
+    """Split ``ALGO BLOB`` or ``ALGO=BLOB`` into an algo number and a --password style blob."""
+    try:
+        return parse_password_line(text)
+    except ValueError as exc:
+        raise _argument_error(str(exc)) from exc
+
+
+def store_main(argv: Sequence[str]) -> int:
+    """`keygen.py store`: pack password blobs into the binary store format."""
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="keygen.py store",
+        description="Write a memory-mappable password store for use with --store")
+    parser.add_argument("output", help="Store file to write (replaced atomically)")
+    parser.add_argument("--builtin", action="store_true",
+                        help="Start from the built-in PASSWORD_MAP")
+    parser.add_argument("--input", "-i", action="append", default=[],
+                        help="Text file of 'ALGO BLOB' lines (# starts a comment); repeatable")
+    parser.add_argument("--blob", "-b", action="append", default=[], type=parse_blob_line,
+                        help="Single ALGO=BLOB entry, blob as for --password; repeatable")
+    args = parser.parse_args(argv)
+
+    password_map: Dict[int, str] = dict(PASSWORD_MAP) if args.builtin else {}
+    try:
+        for path in args.input:
+            with open(path, encoding="utf-8") as handle:
+                password_map.update(read_password_lines(handle, path))
+        password_map.update(args.blob)
+        if not password_map:
+            parser.error("nothing to write; pass --builtin, --input or --blob")
+        count = write_password_store(args.output, password_map)
+    except (OSError, ValueError) as exc:
+        parser.error(str(exc))
+    print(f"Wrote {args.output}: {count} blobs")
+    return 0
+
+
+def print_all_algos(results: Dict[int, DerivationResult], seed: bytes, layout: str,
+                    verbose: bool) -> None:
+    """Print `derive_key_all_algos` results as an aligned table or a JSON object."""
+    if layout == "json":
+        import json
+
+        if verbose:
+            payload = {f"{algo:#06x}": {"key": result.mac.hex(), "iterations": result.iterations,
+                                        "aes_key": result.aes_key.hex(),
+                                        "engine": result.engine}
+                       for algo, result in sorted(results.items())}
+        else:
+            payload = {f"{algo:#06x}": result.mac.hex()
+                       for algo, result in sorted(results.items())}
+        print(json.dumps(payload, indent=2))
+        return
+    if layout == "csv":
+        for algo, result in sorted(results.items()):
+            extra = (f",{result.iterations},{result.aes_key.hex()},{result.engine}"
+                     if verbose else "")
+            print(f"{algo:#06x},{result.mac.hex()}{extra}")
+        return
+    if not results:
+        print(f"No algo accepts seed {seed.hex()} (tail byte {seed[4]:#04x})", file=sys.stderr)
+        return
+    print(f"{'algo':<8} {'key':<10}  iterations  {'aes key':<32}  engine" if verbose
+          else f"{'algo':<8} key")
+    for algo, result in sorted(results.items()):
+        if verbose:
+            print(f"{algo:#06x}   {result.mac.hex():<10}  {result.iterations:>10}  "
+                  f"{result.aes_key.hex()}  {result.engine}")
+        else:
+            print(f"{algo:#06x}   {result.mac.hex()}")
+
+
+def parse_request(text: str) -> tuple[dict, bool]:
+    """Fields of one request line, and whether it was JSON.
+
+    A line is either a JSON object with ``seed``, ``algo`` and an optional
+    ``id`` that is echoed back, or CSV ``SEED,ALGO``.  Raises ValueError with
+    a message meant for the result line.
+    """
+    if text.startswith("{"):
+        import json
+
+        try:
+            fields = json.loads(text)
+        except ValueError as exc:
+            raise ValueError(f"Bad JSON request: {exc}") from None
+        if not isinstance(fields, dict) or "seed" not in fields or "algo" not in fields:
+            raise ValueError("JSON request needs 'seed' and 'algo'")
+        return fields, True
+    parts = [part.strip() for part in text.split(",")]
+    if len(parts) != 2:
+        raise ValueError("CSV request must be SEED,ALGO")
+    return {"seed": parts[0], "algo": parts[1]}, False
+
+
+def is_request_line(text: str) -> bool:
+    """False for blank lines, ``#`` comments and a ``seed,algo`` header."""
+    return bool(text) and not text.startswith("#") and not text.lower().startswith("seed,")
+
+
+def request_pair(fields: dict) -> tuple[int, bytes]:
+    """Validate a request's ``seed`` and ``algo`` fields like ``--seed``/``--algo``."""
+    seed = parse_seed(str(fields["seed"]))
+    algo = fields["algo"]
+    if not isinstance(algo, int) or isinstance(algo, bool):
+        algo = parse_algo(str(algo))
+    elif not 0 <= algo <= 0xFFFF:
+        raise ValueError("Algo must fit in 16 bits")
+    return algo, seed
+
+
+def request_results(lines: Iterable[str], password_map: Mapping[int, str] | None,
+                    engine: str | None, namespace: str | None, verbose: bool
+                    ) -> List[tuple[dict, bool]]:
+    """(result, was_json) for every request in `lines`, derived as one batch.
+
+    Lines failing `is_request_line` are skipped, the rest validated with
+    `request_pair`; valid requests go
+    through `derive_keys_batch`, so errors read as from `derive_key_from_algo`.
+    """
+    import argparse
+
+    parsed: List[tuple[dict, bool, int | str]] = []
+    pairs: List[tuple[int, bytes]] = []
+    for line in lines:
+        text = line.strip()
+        if not is_request_line(text):
+            continue
+        fields: dict = {}
+        is_json = text.startswith("{")
+        try:
+            fields, is_json = parse_request(text)
+            algo, seed = request_pair(fields)
+        except (argparse.ArgumentTypeError, ValueError) as exc:
+            parsed.append((fields, is_json, str(exc)))
+            continue
+        parsed.append((fields, is_json, len(pairs)))
+        pairs.append((algo, seed))
+    derived = derive_keys_batch(pairs, password_map, engine, namespace) if pairs else []
+
+    results = []
+    for fields, is_json, outcome in parsed:
+        if isinstance(outcome, str):
+            result = {"seed": str(fields.get("seed", "")), "algo": fields.get("algo", ""),
+                      "error": outcome}
+        else:
+            item = derived[outcome]
+            result = {"seed": item.seed.hex(), "algo": item.algo}
+            if not item.ok:
+                result["error"] = item.error
+            elif verbose:
+                result.update(key=item.mac.hex(), iterations=item.iterations,
+                              aes_key=item.aes_key.hex(), engine=item.engine)
+            else:
+                result["key"] = item.mac.hex()
+        if "id" in fields:
+            result = {"id": fields["id"], **result}
+        results.append((result, is_json))
+    return results
+
+
+def write_results(output: TextIO, results: Iterable[tuple[dict, bool]], layout: str | None,
+                  verbose: bool) -> int:
+    """Write one line per result, JSON or CSV per `layout` (None: as the request was).
+
+    CSV rows are ``seed,algo,key[,iterations,aes_key,engine],error``.  Returns how
+    many results were errors.
+    """
+    import csv
+    import json
+
+    writer = csv.writer(output, lineterminator="\n")
+    failures = 0
+    for result, is_json in results:
+        failures += "error" in result
+        if layout == "json" or (layout is None and is_json):
+            output.write(json.dumps(result) + "\n")
+            continue
+        algo = result["algo"]
+        row = [result["seed"], f"{algo:#06x}" if isinstance(algo, int) else algo,
+               result.get("key", "")]
+        if verbose:
+            row += [result.get("iterations", ""), result.get("aes_key", ""),
+                    result.get("engine", "")]
+        writer.writerow(row + [result.get("error", "")])
+    return failures
+
+
+def stream_main(lines: Iterable[str], output: TextIO,
+                password_map: Mapping[int, str] | None, engine: str | None,
+                namespace: str | None, layout: str | None, verbose: bool) -> int:
+    """`keygen.py --stream`: answer one request per input line until EOF.
+
+    Each result is flushed as soon as it is written.  The process, and with
+    it keylib's record, hash-chain and key-schedule caches, stays alive
+    between lines.  Returns 1 if any request failed.
+    """
+    failed = False
+    for line in lines:
+        results = request_results([line], password_map, engine, namespace, verbose)
+        if results:
+            failed |= bool(write_results(output, results, layout, verbose))
+            output.flush()
+    return 1 if failed else 0
+
+
+# Per-process settings for `batch_main` workers, set by `_init_batch_worker`.
+_BATCH_WORKER: tuple = ()
+
+
+def _init_batch_worker(store: str | None, engine: str | None, namespace: str | None,
+                       layout: str | None, verbose: bool) -> None:
+    global _BATCH_WORKER
+    password_map = load_password_map_file(store) if store else None
+    _BATCH_WORKER = (password_map, engine, namespace, layout, verbose)
+
+
+def _run_batch_chunk(lines: List[bytes]) -> tuple[bytes, int, int, int]:
+    """(output bytes, results, errors, input bytes) for one chunk of request lines."""
+    import io
+
+    password_map, engine, namespace, layout, verbose = _BATCH_WORKER
+    results = request_results([line.decode("utf-8", "replace") for line in lines],
+                              password_map, engine, namespace, verbose)
+    buffer = io.StringIO()
+    failures = write_results(buffer, results, layout, verbose)
+    return buffer.getvalue().encode("utf-8"), len(results), failures, sum(map(len, lines))
+
+
+def _run_binary_range(job: tuple[str, str, int, int]) -> tuple[int, int]:
+    """(rows, errors) after deriving one row range of a binary request file."""
+    password_map, engine, namespace, _, _ = _BATCH_WORKER
+    requests, responses, start, stop = job
+    return derive_batch_file(requests, responses, password_map, engine, namespace, start, stop)
+
+
+def binary_batch(requests: str, responses: str, jobs: int, setup: tuple) -> tuple[int, int]:
+    """(rows, errors) for a binary request file, split into row ranges over `jobs`.
+
+    Rows are fixed-width, so each worker writes its own slice of the response
+    file and nothing has to be reassembled.
+    """
+    source = BatchFile(requests)
+    rows = source.rows
+    source.close()
+    create_batch_responses(responses, rows)
+    span = max(BUFFER_CHUNK_ROWS, -(-rows // (4 * jobs)))
+    ranges = [(requests, responses, first, first + span) for first in range(0, rows, span)]
+    errors = 0
+    for _, failures in map_chunks(ranges, jobs, setup, _run_binary_range):
+        errors += failures
+    return rows, errors
+
+
+class BatchCheckpoint:
+    """Progress of a `batch_main` run, committed to a small JSON file.
+
+    ``offset`` is the input byte offset up to which every line has its result
+    in the output, ``output_offset`` the output size at that point, and
+    ``rows``/``errors`` the results written so far.  The input file's size
+    and mtime plus the run settings are recorded too, so a checkpoint is only
+    resumed against the run it came from.
+    """
+    __slots__ = ("path", "identity", "offset", "output_offset", "rows", "errors")
+
+    def __init__(self, path: str, identity: dict) -> None:
+        self.path = path
+        self.identity = identity
+        self.offset = self.output_offset = self.rows = self.errors = 0
+
+    def load(self) -> bool:
+        """Pick up a previous run's progress; False when there is no checkpoint file."""
+        import json
+
+        try:
+            with open(self.path, encoding="utf-8") as handle:
+                state = json.load(handle)
+        except FileNotFoundError:
+            return False
+        except ValueError as exc:
+            raise ValueError(f"{self.path}: unreadable checkpoint: {exc}") from None
+        counters = ("offset", "output_offset", "rows", "errors")
+        if not isinstance(state, dict) or not all(
+                type(state.get(name)) is int and state[name] >= 0 for name in counters):
+            raise ValueError(f"{self.path}: unreadable checkpoint: not a batch checkpoint")
+        if state.get("identity") != self.identity:
+            raise ValueError(f"{self.path} was written for a different input or settings; "
+                             "delete it to start over")
+        self.offset = state["offset"]
+        self.output_offset = state["output_offset"]
+        self.rows = state["rows"]
+        self.errors = state["errors"]
+        return True
+
+    def commit(self, sink) -> None:
+        """Make the output durable up to its current size, then record that size."""
+        import json
+
+        sink.flush()
+        os.fsync(sink.fileno())
+        self.output_offset = sink.tell()
+        state = {"identity": self.identity, "offset": self.offset,
+                 "output_offset": self.output_offset, "rows": self.rows,
+                 "errors": self.errors}
+        temp = f"{self.path}.tmp"
+        with open(temp, "w", encoding="utf-8") as handle:
+            json.dump(state, handle)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(temp, self.path)
+
+
+def batch_main(argv: Sequence[str]) -> int:
+    """`keygen.py batch`: derive a request file into a result file on a process pool."""
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="keygen.py batch",
+        description="Derive keys for a file of 'SEED,ALGO' or JSON request lines; results "
+                    "are written in input order, in the --stream line format")
+    parser.add_argument("input", help="Request file, one request per line")
+    parser.add_argument("output", help="Result file to write")
+    parser.add_argument("--jobs", "-j", type=int, default=os.cpu_count() or 1,
+                        help="Worker processes; 1 derives in this process (default: %(default)s)")
+    parser.add_argument("--chunk-rows", type=int, default=20000,
+                        help="Request lines per work unit (default: %(default)s)")
+    parser.add_argument("--store", help="Password store or text map to look algos up in")
+    parser.add_argument("--map", "-m", dest="namespace", metavar="NAME",
+                        help="Platform map namespace (see keygen.py --help)")
+    parser.add_argument("--engine", choices=sorted(AES_BACKENDS),
+                        help="AES backend (default: keylib's batch selection)")
+    parser.add_argument("--format", choices=("csv", "json"),
+                        help="Result line format (default: same as each request line)")
+    parser.add_argument("--verbose", "-v", action="store_true",
+                        help="Include iterations and AES keys in results")
+    parser.add_argument("--checkpoint", metavar="PATH",
+                        help="Commit progress to PATH and resume from it if it exists; "
+                             "removed once the run completes")
+    parser.add_argument("--checkpoint-every", type=float, default=10.0, metavar="SECONDS",
+                        help="Seconds between checkpoint commits (default: %(default)s)")
+    args = parser.parse_args(argv)
+    if args.jobs < 1 or args.chunk_rows < 1:
+        parser.error("--jobs and --chunk-rows must be at least 1")
+    if args.store and args.namespace:
+        parser.error("--store and --map are mutually exclusive")
+
+    import itertools
+
+    setup = (args.store, args.engine, args.namespace, args.format, args.verbose)
+    start = time.perf_counter()
+    try:
+        with open(args.input, "rb") as handle:
+            binary = handle.read(len(BATCH_REQUEST_MAGIC)) == BATCH_REQUEST_MAGIC
+    except OSError as exc:
+        parser.error(str(exc))
+    if binary:
+        if args.checkpoint or args.format or args.verbose:
+            parser.error("binary request files take no --checkpoint, --format or --verbose")
+        try:
+            rows, errors = binary_batch(args.input, args.output, args.jobs, setup)
+        except (OSError, ValueError) as exc:
+            parser.error(str(exc))
+        elapsed = time.perf_counter() - start
+        print(f"{rows} requests, {errors} errors in {elapsed:.2f}s "
+              f"({rows / elapsed if elapsed else 0:.0f} rows/s, {args.jobs} jobs)",
+              file=sys.stderr)
+        return 1 if errors else 0
+    try:
+        info = os.stat(args.input)
+        checkpoint = BatchCheckpoint(args.checkpoint or "", {
+            "input": os.path.abspath(args.input), "output": os.path.abspath(args.output),
+            "size": info.st_size,
+            "mtime_ns": info.st_mtime_ns, "settings": list(setup)})
+        resumed = bool(args.checkpoint) and checkpoint.load()
+        resumed_rows = checkpoint.rows
+        with open(args.input, "rb") as source, \
+                open(args.output, "r+b" if resumed else "wb") as sink:
+            if resumed:
+                if os.fstat(sink.fileno()).st_size < checkpoint.output_offset:
+                    raise ValueError(f"{args.output} is shorter than {args.checkpoint} "
+                                     "records; delete the checkpoint to start over")
+                # Anything past the committed size was written after the last
+                # checkpoint and will be produced again.
+                sink.truncate(checkpoint.output_offset)
+                sink.seek(checkpoint.output_offset)
+                source.seek(checkpoint.offset)
+                print(f"Resuming at row {checkpoint.rows} (input byte {checkpoint.offset})",
+                      file=sys.stderr)
+            chunks = iter(lambda: list(itertools.islice(source, args.chunk_rows)), [])
+            next_commit = time.monotonic() + args.checkpoint_every
+            for data, count, failures, consumed in map_chunks(chunks, args.jobs, setup):
+                sink.write(data)
+                checkpoint.offset += consumed
+                checkpoint.rows += count
+                checkpoint.errors += failures
+                if args.checkpoint and time.monotonic() >= next_commit:
+                    checkpoint.commit(sink)
+                    next_commit = time.monotonic() + args.checkpoint_every
+    except (OSError, ValueError) as exc:
+        parser.error(str(exc))
+    if args.checkpoint and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+    rows, errors = checkpoint.rows, checkpoint.errors
+    elapsed = time.perf_counter() - start
+    print(f"{rows} requests, {errors} errors in {elapsed:.2f}s "
+          f"({(rows - resumed_rows) / elapsed if elapsed else 0:.0f} rows/s, "
+          f"{args.jobs} jobs)", file=sys.stderr)
+    return 1 if errors else 0
+
+
+def map_chunks(chunks: Iterable, jobs: int, setup: tuple,
+               work: Callable = _run_batch_chunk) -> Iterable:
+    """`work` (by default `_run_batch_chunk`) over `chunks` on `jobs` processes,
+    yielding results in input order.
+
+    At most two chunks per worker are read ahead of the consumer, so memory
+    stays bounded however long the input is.  ``jobs=1`` runs in-process.
+    """
+    if jobs == 1:
+        _init_batch_worker(*setup)
+        yield from map(work, chunks)
+        return
+    from collections import deque
+    from concurrent.futures import ProcessPoolExecutor
+
+    pending: deque = deque()
+    with ProcessPoolExecutor(jobs, initializer=_init_batch_worker, initargs=setup) as pool:
+        for chunk in chunks:
+            pending.append(pool.submit(work, chunk))
+            if len(pending) >= 2 * jobs:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def convert_main(argv: Sequence[str]) -> int:
+    """`keygen.py convert`: translate batch files between text and the binary format."""
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="keygen.py convert",
+        description="Convert 'SEED,ALGO'/JSON request lines to a binary request file, a binary "
+                    "request file back to 'SEED,ALGO' lines, or a binary response file to "
+                    "result lines (with --requests)")
+    parser.add_argument("input", help="Text request file, or binary request/response file")
+    parser.add_argument("output", help="File to write")
+    parser.add_argument("--requests", help="Binary request file a response file answers")
+    parser.add_argument("--store", help="Password store or text map the batch used, for "
+                                        "the wording of error results")
+    parser.add_argument("--map", "-m", dest="namespace", metavar="NAME",
+                        help="Platform map namespace the batch used (see keygen.py --help)")
+    args = parser.parse_args(argv)
+    if args.store and args.namespace:
+        parser.error("--store and --map are mutually exclusive")
+    try:
+        with open(args.input, "rb") as handle:
+            magic = handle.read(len(BATCH_REQUEST_MAGIC))
+        if magic == BATCH_REQUEST_MAGIC:
+            with open(args.output, "w", encoding="utf-8") as sink:
+                rows = 0
+                for algo, seed in read_batch_requests(args.input):
+                    sink.write(f"{seed.hex()},{algo:#06x}\n")
+                    rows += 1
+        elif magic == BATCH_RESPONSE_MAGIC:
+            if not args.requests:
+                parser.error("responses carry no seeds or algos; pass --requests")
+            responses = BatchFile(args.input)
+            requests = BatchFile(args.requests)
+            rows = requests.rows
+            mismatch = responses.rows != rows
+            responses.close()
+            requests.close()
+            if mismatch:
+                parser.error(f"{args.input} and {args.requests} have different row counts")
+            password_map = load_password_map_file(args.store) if args.store else None
+            pairs = zip(read_batch_requests(args.requests), read_batch_responses(args.input))
+            # Rejected rows get the message a text batch writes for them, which
+            # depends on the map; the status code is the fallback if it changed.
+            results = (({"seed": seed.hex(), "algo": algo,
+                         "error": rejection_message(algo, seed, password_map, args.namespace)
+                         or SEED_REJECT_REASONS[status]}
+                        if status else {"seed": seed.hex(), "algo": algo, "key": mac.hex()},
+                        False)
+                       for (algo, seed), (mac, status) in pairs)
+            with open(args.output, "w", encoding="utf-8", newline="") as sink:
+                write_results(sink, results, "csv", False)
+        else:
+            rows = write_batch_requests(args.output, text_request_pairs(args.input))
+    except (OSError, ValueError) as exc:
+        parser.error(str(exc))
+    print(f"Wrote {args.output}: {rows} rows")
+    return 0
+
+
+def text_request_pairs(path: str) -> Iterable[tuple[int, bytes]]:
+    """(algo, seed) for every request line of a text file; a bad line raises ValueError."""
+    import argparse
+
+    with open(path, encoding="utf-8") as source:
+        for number, line in enumerate(source, 1):
+            text = line.strip()
+            if not is_request_line(text):
+                continue
+            try:
+                yield request_pair(parse_request(text)[0])
+            except (argparse.ArgumentTypeError, ValueError) as exc:
+                raise ValueError(f"{path}:{number}: {exc}") from None
+
+
+def answer_request(claimed: str, result: str) -> tuple[int, int]:
+    """Derive a claimed request file into `result`, written atomically; (rows, errors).
+
+    Binary request files (see `BATCH_REQUEST_MAGIC`) get a binary response
+    file, text ones result lines in the ``--stream`` format.  Uses the
+    settings `_init_batch_worker` stored.
+    """
+    password_map, engine, namespace, layout, verbose = _BATCH_WORKER
+    temp = os.path.join(os.path.dirname(result), f".{os.path.basename(result)}.tmp")
+    try:
+        with open(claimed, "rb") as handle:
+            binary = handle.read(len(BATCH_REQUEST_MAGIC)) == BATCH_REQUEST_MAGIC
+        if binary:
+            rows, errors = derive_batch_file(claimed, temp, password_map, engine, namespace)
+        else:
+            with open(claimed, encoding="utf-8", errors="replace") as source:
+                results = request_results(source, password_map, engine, namespace, verbose)
+            with open(temp, "w", encoding="utf-8", newline="") as sink:
+                errors = write_results(sink, results, layout, verbose)
+            rows = len(results)
+        os.replace(temp, result)
+    except BaseException:
+        if os.path.exists(temp):
+            os.remove(temp)
+        raise
+    return rows, errors
+
+
+def scan_requests(directory: str, suffix: str, settle: float) -> tuple[List[str], bool]:
+    """(request files ready to claim, whether any are still settling).
+
+    A file is ready once it has not been modified for `settle` seconds, so
+    a writer that creates it in place gets to finish first.  Dot-files are
+    ignored, which lets writers stage under a hidden name and rename.
+    """
+    ready = []
+    settling = False
+    now = time.time()
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.name.startswith(".") or not entry.name.endswith(suffix):
+                continue
+            try:
+                if not entry.is_file():
+                    continue
+                age = now - entry.stat().st_mtime
+            except OSError:
+                continue
+            if age >= settle:
+                ready.append(entry.path)
+            else:
+                settling = True
+    ready.sort()
+    return ready, settling
+
+
+def watch_main(argv: Sequence[str]) -> int:
+    """`keygen.py watch`: turn request files dropped into a directory into result files."""
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="keygen.py watch",
+        description="Answer request files dropped into DIR: NAME.req (text, as for --stream, "
+                    "or binary) becomes NAME.res next to it")
+    parser.add_argument("directory", metavar="DIR", help="Drop folder to watch")
+    parser.add_argument("--suffix", default=".req",
+                        help="Request file suffix (default: %(default)s)")
+    parser.add_argument("--result-suffix", default=".res",
+                        help="Suffix replacing --suffix on result files (default: %(default)s)")
+    parser.add_argument("--poll-interval", type=float, default=0.1, metavar="SECONDS",
+                        help="Seconds between directory checks (default: %(default)s)")
+    parser.add_argument("--settle", type=float, default=0.05, metavar="SECONDS",
+                        help="Leave files modified more recently than this (default: %(default)s)")
+    parser.add_argument("--max-inflight", type=int, default=8,
+                        help="Claimed files waiting or in progress at once (default: %(default)s)")
+    parser.add_argument("--keep", action="store_true",
+                        help="Keep answered requests as NAME.req.done instead of deleting them")
+    parser.add_argument("--once", action="store_true",
+                        help="Answer the files already present, then exit")
+    parser.add_argument("--store", help="Password store or text map, followed for changes")
+    parser.add_argument("--map", "-m", dest="namespace", metavar="NAME",
+                        help="Platform map namespace (see keygen.py --help)")
+    parser.add_argument("--engine", choices=sorted(AES_BACKENDS),
+                        help="AES backend (default: keylib's batch selection)")
+    parser.add_argument("--format", choices=("csv", "json"),
+                        help="Text result format (default: same as each request line)")
+    parser.add_argument("--verbose", "-v", action="store_true",
+                        help="Include iterations and AES keys in text results")
+    args = parser.parse_args(argv)
+    if args.max_inflight < 1 or args.poll_interval <= 0:
+        parser.error("--max-inflight and --poll-interval must be positive")
+    if args.store and args.namespace:
+        parser.error("--store and --map are mutually exclusive")
+    if not os.path.isdir(args.directory):
+        parser.error(f"{args.directory} is not a directory")
+
+    import queue
+    import threading
+
+    try:
+        password_map = ReloadingPasswordMap(args.store) if args.store else None
+    except (OSError, ValueError) as exc:
+        parser.error(str(exc))
+    # One worker thread derives every file, so keylib's caches stay warm
+    # across files; the scanner claims a file only once it holds a slot.
+    global _BATCH_WORKER
+    _BATCH_WORKER = (password_map, args.engine, args.namespace, args.format, args.verbose)
+    work: queue.Queue = queue.Queue()
+    slots = threading.BoundedSemaphore(args.max_inflight)
+    latencies: List[float] = []
+    totals = {"files": 0, "rows": 0, "errors": 0, "failed": 0}
+
+    def answer_claimed(claimed: str, written_at: float, claimed_at: float) -> None:
+        base = claimed[:-len(args.suffix) - len(".work")]
+        name = os.path.basename(base) + args.suffix
+        started = time.perf_counter()
+        try:
+            rows, errors = answer_request(claimed, base + args.result_suffix)
+            if args.keep:
+                os.replace(claimed, base + args.suffix + ".done")
+            else:
+                os.remove(claimed)
+        except Exception as exc:
+            # Any failure is confined to this file; the worker must keep draining.
+            totals["failed"] += 1
+            print(f"{name}: failed: {exc}", file=sys.stderr, flush=True)
+            try:
+                os.replace(claimed, base + args.suffix + ".failed")
+            except OSError as move_exc:
+                print(f"{name}: could not move to .failed: {move_exc}", file=sys.stderr,
+                      flush=True)
+            return
+        finished = time.time()
+        latency = finished - written_at
+        latencies.append(latency)
+        totals["files"] += 1
+        totals["rows"] += rows
+        totals["errors"] += errors
+        print(f"{name}: {rows} rows, {errors} errors, {latency * 1000:.1f} ms since "
+              f"written ({(finished - claimed_at) * 1000:.1f} ms after claim, "
+              f"{(time.perf_counter() - started) * 1000:.1f} ms deriving)",
+              file=sys.stderr, flush=True)
+
+    def worker() -> None:
+        while True:
+            item = work.get()
+            if item is None:
+                return
+            try:
+                answer_claimed(*item)
+            finally:
+                slots.release()
+
+    thread = threading.Thread(target=worker, name="keygen-watch", daemon=True)
+    thread.start()
+    print(f"Watching {args.directory} for *{args.suffix}", file=sys.stderr, flush=True)
+    last_listing = None
+    next_full_scan = 0.0
+    try:
+        while True:
+            # Re-list only when the directory changed or files are still settling,
+            # plus once a second in case the filesystem's mtime is coarse.
+            listing = os.stat(args.directory).st_mtime_ns
+            ready: List[str] = []
+            settling = False
+            if listing != last_listing or time.monotonic() >= next_full_scan:
+                next_full_scan = time.monotonic() + 1.0
+                ready, settling = scan_requests(args.directory, args.suffix, args.settle)
+                last_listing = None if settling else listing
+            for path in ready:
+                if not slots.acquire(timeout=args.poll_interval):
+                    # Leave the rest unclaimed, for this or another watcher, and look
+                    # again on the next pass.
+                    last_listing = None
+                    break
+                claimed = path + ".work"
+                try:
+                    written_at = os.stat(path).st_mtime
+                    # rename() is atomic, so only one watcher can claim a file.
+                    os.rename(path, claimed)
+                except OSError:
+                    slots.release()
+                    continue
+                work.put((claimed, written_at, time.time()))
+            if args.once and last_listing is not None:
+                break
+            time.sleep(args.poll_interval)
+    except KeyboardInterrupt:
+        pass
+    work.put(None)
+    thread.join()
+    if latencies:
+        latencies.sort()
+        print(f"{totals['files']} files, {totals['rows']} rows, {totals['errors']} errors, "
+              f"{totals['failed']} failed; latency median "
+              f"{latencies[len(latencies) // 2] * 1000:.1f} ms, max {latencies[-1] * 1000:.1f} ms",
+              file=sys.stderr)
+    return 1 if totals["failed"] else 0
+
+
+COMMANDS: Dict[str, Callable[[Sequence[str]], int]] = {
+    "batch": batch_main,
+    "convert": convert_main,
+    "precompute": precompute_main,
+    "store": store_main,
+    "watch": watch_main,
+}
+
+
 def main(argv: Sequence[str] | None = None) -> int:
     """Entry point for the CLI tool."""
+    import argparse
+
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if argv and argv[0] in COMMANDS:
+        return COMMANDS[argv[0]](argv[1:])
     parser = argparse.ArgumentParser(description="Reproduce sa015bcr key derivation")
     parser.add_argument("--password", "-p",
                         help="Override password blob (defaults to library mapping by algo)")
-    parser.add_argument("--seed", "-s", required=True, type=parse_seed,
+    parser.add_argument("--store",
+                        help="Look the algo up in a password store (see 'keygen.py store') "
+                             "or a text file of 'ALGO BLOB' lines")
+    parser.add_argument("--map", "-m", dest="namespace", metavar="NAME",
+                        help="Platform map namespace, e.g. gm-global-a (the built-in map); "
+                             "others are registered or found on $KEYLIB_MAP_PATH")
+    parser.add_argument("--seed", "-s", type=parse_seed,
                         help="5-byte seed expressed as 10 hex digits (spaces/colons allowed)")
-    parser.add_argument("--algo", "-a", required=True, type=parse_algo,
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--algo", "-a", type=parse_algo,
                         help="Algorithm selector (decimal or 0x-prefixed hex)")
+    target.add_argument("--all-algos", action="store_true",
+                        help="Derive the key under every algo whose blob accepts the seed")
+    target.add_argument("--stream", action="store_true",
+                        help="Read 'SEED,ALGO' or JSON requests from stdin, one per line, and "
+                             "write one flushed result line each")
+    parser.add_argument("--format", choices=("table", "json", "csv"),
+                        help="Output layout for --all-algos (default: table) or --stream "
+                             "(default: same as each input line)")
+    parser.add_argument("--engine", choices=sorted(AES_BACKENDS),
+                        help=f"AES backend to use (default: $KEYLIB_AES_BACKEND, else "
+                             f"{SINGLE_SHOT_BACKEND} for a single --algo derivation and "
+                             f"keylib's batch selection otherwise)")
     parser.add_argument("--verbose", "-v", action="store_true", help="Show intermediate values")
     args = parser.parse_args(argv)
+    if args.store and args.namespace:
+        parser.error("--store and --map are mutually exclusive")
+    password_map: Mapping[int, str] | None
+    if args.stream:
+        if args.seed or args.password:
+            parser.error("--stream reads seeds and algos from stdin; drop --seed/--password")
+        if args.format == "table":
+            parser.error("--stream writes csv or json lines, not a table")
+        try:
+            password_map = ReloadingPasswordMap(args.store) if args.store else None
+        except (OSError, ValueError) as exc:
+            parser.error(str(exc))
+        return stream_main(iter(sys.stdin.readline, ""), sys.stdout, password_map, args.engine,
+                           args.namespace, args.format, args.verbose)
+    if args.seed is None:
+        parser.error("the following arguments are required: --seed/-s")
+    if args.algo is None and not args.all_algos:
+        parser.error("one of the arguments --algo/-a --all-algos --stream is required")
+    if args.all_algos:
+        if args.password:
+            parser.error("--all-algos looks algos up in a map; it cannot use --password")
+        try:
+            password_map = load_password_map_file(args.store) if args.store else None
+            results = derive_key_all_algos(args.seed, password_map=password_map,
+                                           engine=args.engine, namespace=args.namespace)
+        except (OSError, ValueError) as exc:
+            parser.error(str(exc))
+        print_all_algos(results, args.seed, args.format or "table", args.verbose)
+        return 0 if results else 1
 
     try:
         if args.password:
-            mac, iterations, aes_key = derive_key_from_blob(args.password, args.seed, args.algo)
+            mac, iterations, aes_key = derive_key_from_blob(args.password, args.seed, args.algo,
+                                                            args.engine)
         else:
-            mac, iterations, aes_key = derive_key_from_algo(args.algo, args.seed)
-    except ValueError as exc:
+            password_map = load_password_map_file(args.store) if args.store else None
+            mac, iterations, aes_key = derive_key_from_algo(args.algo, args.seed, password_map,
+                                                            args.engine, args.namespace)
+    except (OSError, ValueError) as exc:
         parser.error(str(exc))
 
     if args.verbose:
         print(f"Iterations   : {iterations}")
         print(f"AES key      : {aes_key.hex()}")
         print(f"Seed (bytes) : {args.seed.hex()}")
+        # Mirrors keylib.single_shot_backend, which served the derivation above.
+        if args.engine:
+            print(f"AES backend  : {args.engine} (from --engine)")
+        elif os.environ.get(AES_BACKEND_ENV, "").strip():
+            print(f"AES backend  : {select_aes_backend().describe()}")
+        else:
+            print(f"AES backend  : {SINGLE_SHOT_BACKEND} (single-block default)")
     print(mac.hex())
     return 0
 
@@ -1,10 +1,27 @@
 """Utilities that reproduce the sa015bcr key-derivation pipeline."""
 from __future__ import annotations
 
-import base64
+import binascii
+import functools
 import hashlib
-from dataclasses import dataclass
-from typing import Dict, List, Mapping, MutableMapping, Sequence
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from array import array
+from collections import OrderedDict, namedtuple
+from collections.abc import Mapping
+
+# Annotations are strings at runtime (PEP 563), so `typing` is only needed by
+# type checkers.  Skipping it, like `dataclasses` and `base64`, keeps `re` and
+# `inspect` out of the import chain of every keygen.py run.
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import (Any, Callable, Collection, Dict, Iterable, Iterator, List,
+                        MutableMapping, Sequence)
+    from types import CodeType
 
 PASSWORD_MAP: Dict[int, str] = {
     0x00: "01EgjpxczBk2pRSn6r/UfgIDriRFHxEtkT7dlcdQOpq2sA9QAAfP9QboFog6A=",
@@ -306,12 +323,53 @@ RCON: List[int] = [
 ]
 
 
-@dataclass
 class PasswordRecord:
+    """Decoded blob fields: 32-byte ``secret``, ``min_seed``, and ``algo_id``.
+
+    Behaves like ``@dataclass(frozen=True, slots=True)`` -- keyword or
+    positional construction, field equality, hashable, read-only -- but is
+    written out because importing `dataclasses` pulls `re` and `inspect` into
+    every keygen.py start.  Records are shared through
+    `parse_password_blob_cached`, hence frozen.
+    """
+    __slots__ = ("secret", "min_seed", "algo_id")
+
     secret: bytes
     min_seed: int
     algo_id: int
 
+    def __init__(self, secret: bytes, min_seed: int, algo_id: int) -> None:
+        object.__setattr__(self, "secret", secret)
+        object.__setattr__(self, "min_seed", min_seed)
+        object.__setattr__(self, "algo_id", algo_id)
+
+    def _fields(self) -> tuple[bytes, int, int]:
+        return self.secret, self.min_seed, self.algo_id
+
+    def __setattr__(self, name: str, value: object) -> None:
+        raise AttributeError(f"cannot assign to field {name!r}")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f"cannot delete field {name!r}")
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, PasswordRecord) or other.__class__ is not self.__class__:
+            return NotImplemented
+        return self._fields() == other._fields()
+
+    def __hash__(self) -> int:
+        return hash(self._fields())
+
+    def __reduce__(self) -> tuple[type, tuple[bytes, int, int]]:
+        return PasswordRecord, self._fields()
+
+    def __repr__(self) -> str:
+        return (f"PasswordRecord(secret={self.secret!r}, min_seed={self.min_seed!r}, "
+                f"algo_id={self.algo_id!r})")
+
+
+BASE64_ALPHABET = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/"
+
 
 def parse_password_blob(blob: str) -> PasswordRecord:
     """Validate and unpack a 62-char blob into its secret, thresholds, and id."""
@@ -323,7 +381,11 @@ def parse_password_blob(blob: str) -> PasswordRecord:
     payload = blob[2:]
     if len(payload) != 60:
         raise ValueError("Password payload must be exactly 60 Base64 characters")
-    raw = base64.b64decode(payload, validate=True)
+    # Same check as ``base64.b64decode(validate=True)`` without importing `re`.
+    body = payload.rstrip("=")
+    if len(payload) - len(body) > 2 or body.strip(BASE64_ALPHABET):
+        raise ValueError("Non-base64 digit found")
+    raw = binascii.a2b_base64(payload)
     if len(raw) != 44:
         raise ValueError("Decoded payload must be 44 bytes")
     secret = raw[:32]
@@ -335,6 +397,569 @@ def parse_password_blob(blob: str) -> PasswordRecord:
     return PasswordRecord(secret=secret, min_seed=min_seed, algo_id=algo_id)
 
 
+# Seed-tail acceptance.  A seed is valid for a record when its last byte t
+# satisfies ``min_seed <= 255 - t``, so each algo accepts a fixed subset of
+# the 256 possible tails; `acceptance_bitmap` packs that subset into an int
+# (bit t set = tail t accepted).  `screen_seeds` reports one of these codes
+# per row, indexing `SEED_REJECT_REASONS` for a description.
+SEED_ACCEPTED = 0
+SEED_NO_BLOB = 1
+SEED_BAD_BLOB = 2
+SEED_ALGO_MISMATCH = 3
+SEED_BELOW_MIN = 4
+SEED_REJECT_REASONS = ("accepted", "no password blob registered", "password blob is invalid",
+                       "blob is for a different algorithm", "seed below the blob's min_seed")
+
+
+def acceptance_bitmap(record: PasswordRecord, algo: int) -> int:
+    """256-bit mask of the seed tail bytes `record` accepts for `algo`."""
+    if record.algo_id != algo:
+        return 0
+    return (1 << max(0, 256 - record.min_seed)) - 1
+
+
+@functools.lru_cache(maxsize=4096)
+def parse_password_blob_cached(blob: str) -> PasswordRecord:
+    """`parse_password_blob` memoized by blob text; records are immutable and shared."""
+    return parse_password_blob(blob)
+
+
+class _RegistryEntry:
+    """Outcome of compiling one blob: the record, or the reason it was rejected.
+
+    ``accepts`` is the record's `acceptance_bitmap` (0 for a rejected blob).
+    """
+    __slots__ = ("blob", "record", "error", "accepts")
+
+    def __init__(self, blob: str, record: PasswordRecord | None, error: str | None,
+                 accepts: int = 0) -> None:
+        self.blob = blob
+        self.record = record
+        self.error = error
+        self.accepts = accepts
+
+
+class PasswordRegistry:
+    """Password map whose blobs are decoded and verified at most once each.
+
+    Entries compile lazily on first lookup, or all at once via `compile`.
+    Each entry remembers the blob it came from, so replacing a blob in the
+    underlying mapping is picked up on the next lookup of that algo.  Blobs
+    are compared by content: an equal blob (say, from a reloaded map file)
+    keeps the compiled entry, while a changed one also evicts the old
+    secret's hash chain and key schedules (`invalidate_secret`).
+    """
+
+    def __init__(self, password_map: Mapping[int, str], eager: bool = False,
+                 namespace: str | None = None) -> None:
+        self.password_map = password_map
+        # Registries named by `register_namespace` share `DERIVATION_CACHE`.
+        self.namespace = namespace
+        self.invalidations = 0
+        self.evicted = 0
+        self._entries: Dict[int, _RegistryEntry] = {}
+        if eager:
+            self.compile()
+
+    def _compile_entry(self, algo: int, blob: str) -> _RegistryEntry:
+        try:
+            record = parse_password_blob_cached(blob)
+            entry = _RegistryEntry(blob, record, None, acceptance_bitmap(record, algo))
+        except ValueError as exc:
+            entry = _RegistryEntry(blob, None, str(exc))
+        self._entries[algo] = entry
+        return entry
+
+    def _refresh_entry(self, algo: int, entry: _RegistryEntry | None, blob: str | None
+                       ) -> _RegistryEntry | None:
+        """Bring `algo`'s entry in line with `blob`; None drops it (blob removed)."""
+        if entry is not None:
+            if entry.blob == blob:
+                entry.blob = blob
+                return entry
+            self.invalidations += 1
+            if entry.record is not None:
+                self.evicted += invalidate_secret(entry.record.secret)
+        if blob is None:
+            self._entries.pop(algo, None)
+            return None
+        return self._compile_entry(algo, blob)
+
+    def compile(self) -> "PasswordRegistry":
+        """Eagerly decode and verify every blob; invalid ones are remembered, not raised."""
+        for algo, blob in self.password_map.items():
+            if blob:
+                entry = self._entries.get(algo)
+                if entry is None or entry.blob is not blob:
+                    self._refresh_entry(algo, entry, blob)
+        return self
+
+    def _entry(self, algo: int) -> _RegistryEntry | None:
+        """Up-to-date compiled entry for `algo`, or None when the map has no blob."""
+        blob = self.password_map.get(algo)
+        entry = self._entries.get(algo)
+        if not blob:
+            if entry is not None:
+                self._refresh_entry(algo, entry, None)
+            return None
+        if entry is None or entry.blob is not blob:
+            entry = self._refresh_entry(algo, entry, blob)
+        return entry
+
+    def record(self, algo: int) -> PasswordRecord:
+        """Return the verified record for `algo`, raising ValueError if it has none."""
+        entry = self._entry(algo)
+        if entry is None:
+            raise ValueError(f"No password blob registered for algorithm {algo}")
+        if entry.record is None:
+            raise ValueError(entry.error)
+        return entry.record
+
+    def acceptance(self, algo: int) -> tuple[int, int]:
+        """(bitmap, reason) for `algo`: the 256-bit `acceptance_bitmap` of seed
+        tails, and the ``SEED_*`` code explaining why the other tails fail."""
+        entry = self._entry(algo)
+        if entry is None:
+            return 0, SEED_NO_BLOB
+        if entry.record is None:
+            return 0, SEED_BAD_BLOB
+        if entry.record.algo_id != algo:
+            return 0, SEED_ALGO_MISMATCH
+        return entry.accepts, SEED_BELOW_MIN
+
+    def tail_reasons(self, algo: int) -> bytes:
+        """256 ``SEED_*`` codes for `algo`, indexed by seed tail byte."""
+        accepts, reason = self.acceptance(algo)
+        return bytes(0 if accepts >> tail & 1 else reason for tail in range(256))
+
+    def algos(self) -> List[int]:
+        """Sorted list of algo ids that have a blob in the underlying map."""
+        return sorted(algo for algo, blob in self.password_map.items() if blob)
+
+    def records(self) -> Dict[int, PasswordRecord]:
+        """Verified record for every algo whose blob parses, keyed by algo id."""
+        records: Dict[int, PasswordRecord] = {}
+        for algo in self.algos():
+            try:
+                records[algo] = self.record(algo)
+            except ValueError:
+                continue
+        return records
+
+    def stats(self) -> Dict[str, int]:
+        """Compiled entries, blobs replaced since compiling, and cache entries evicted."""
+        return {"entries": len(self._entries), "invalidations": self.invalidations,
+                "evicted": self.evicted}
+
+    def __contains__(self, algo: object) -> bool:
+        return isinstance(algo, int) and bool(self.password_map.get(algo))
+
+    def __len__(self) -> int:
+        # Empty blobs are absent for `__contains__`, so they are not counted either.
+        return sum(1 for blob in self.password_map.values() if blob)
+
+
+DEFAULT_NAMESPACE = "gm-global-a"
+DEFAULT_REGISTRY = PasswordRegistry(PASSWORD_MAP, namespace=DEFAULT_NAMESPACE)
+
+_MAP_REGISTRIES: OrderedDict[int, PasswordRegistry] = OrderedDict()
+
+
+def registry_for(password_map: Mapping[int, str] | PasswordRegistry | None) -> PasswordRegistry:
+    """Resolve a mapping argument to a registry, reusing one per mapping object."""
+    if password_map is None:
+        return DEFAULT_REGISTRY
+    if isinstance(password_map, PasswordRegistry):
+        return password_map
+    registry = _MAP_REGISTRIES.get(id(password_map))
+    if registry is None or registry.password_map is not password_map:
+        # The registry holds a reference to its map, so the id cannot be recycled.
+        registry = PasswordRegistry(password_map)
+        _MAP_REGISTRIES[id(password_map)] = registry
+        while len(_MAP_REGISTRIES) > 16:
+            _MAP_REGISTRIES.popitem(last=False)
+    return registry
+
+
+# Binary password store: the same (algo -> blob) data as `PASSWORD_MAP`, laid
+# out so a map with thousands of entries opens without decoding anything.
+#
+#   header   magic, version, record size, record count
+#   index    65536 slots, one per algo: record offset (0 = no blob) and the
+#            two-character blob prefix
+#   records  the 44 raw bytes behind each blob's Base64 payload
+PASSWORD_STORE_MAGIC = b"GM5PWST\0"
+PASSWORD_STORE_VERSION = 1
+PASSWORD_STORE_HEADER = struct.Struct("<8sHHI16x")
+PASSWORD_STORE_SLOT = struct.Struct("<I2s2x")
+PASSWORD_STORE_RECORD_SIZE = 44
+PASSWORD_STORE_RECORDS = PASSWORD_STORE_HEADER.size + 65536 * PASSWORD_STORE_SLOT.size
+
+
+def _replace_file(temp_path: str, path: str) -> None:
+    """`os.replace`, with a clear error when Windows refuses because `path` is mapped.
+
+    Windows cannot replace a file that another process holds open or
+    memory-mapped.  Password stores are copied into memory there (see
+    `_read_only_map`), but a `DerivationTable` keeps its mapping open.
+    """
+    try:
+        os.replace(temp_path, path)
+    except PermissionError as exc:
+        if os.name != "nt":
+            raise
+        raise PermissionError(exc.errno, f"cannot replace {path} while another process has it "
+                              "open or memory-mapped; stop those processes, or write to a new "
+                              "path and point them at it") from exc
+
+
+def _read_only_map(handle) -> mmap.mmap:
+    """Read-only mapping of an open file, or on Windows a private in-memory copy.
+
+    A Windows mapping keeps the file locked against replacement for as long
+    as it lives, which would stop `write_password_store` from swapping in a
+    new store under a `ReloadingPasswordMap`.  The copy leaves the file
+    closed, at the cost of one private copy per process.
+    """
+    if os.name != "nt":
+        return mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+    size = os.fstat(handle.fileno()).st_size
+    copy = mmap.mmap(-1, size)
+    handle.readinto(copy)
+    return copy
+
+
+def write_password_store(path: str, password_map: Mapping[int, str]) -> int:
+    """Pack `password_map` into a password store at `path`, returning the record count.
+
+    Every blob is verified with `parse_password_blob` first; a bad one raises
+    ValueError naming its algo.  The file is replaced atomically.
+    """
+    index = bytearray(65536 * PASSWORD_STORE_SLOT.size)
+    records = []
+    offset = PASSWORD_STORE_RECORDS
+    for algo in sorted(password_map):
+        blob = password_map[algo]
+        if not blob:
+            continue
+        if not 0 <= algo <= 0xFFFF:
+            raise ValueError(f"Algo {algo} does not fit the 16-bit store index")
+        try:
+            parse_password_blob(blob)
+        except ValueError as exc:
+            raise ValueError(f"Algo {algo:#06x}: {exc}") from exc
+        PASSWORD_STORE_SLOT.pack_into(index, algo * PASSWORD_STORE_SLOT.size, offset,
+                                      blob[:2].encode("ascii"))
+        records.append(binascii.a2b_base64(blob[2:]))
+        offset += PASSWORD_STORE_RECORD_SIZE
+    header = PASSWORD_STORE_HEADER.pack(PASSWORD_STORE_MAGIC, PASSWORD_STORE_VERSION,
+                                        PASSWORD_STORE_RECORD_SIZE, len(records))
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, "wb") as handle:
+            handle.write(header)
+            handle.write(index)
+            handle.writelines(records)
+        _replace_file(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return len(records)
+
+
+class PasswordStore(Mapping):
+    """Read-only ``Mapping[int, str]`` over a memory-mapped password store.
+
+    On Windows the file is copied into memory instead (`_read_only_map`), so
+    `write_password_store` can still replace it.  Opening checks the header
+    only.  A lookup reads one index slot and re-encodes that record's blob,
+    which is then kept so repeated lookups return the same string (and
+    `PasswordRegistry` keeps its compiled entry).
+    Accepted anywhere a password map is, e.g. ``derive_key_from_algo(...,
+    password_map=PasswordStore(path))``.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(path, "rb") as handle:
+            if os.fstat(handle.fileno()).st_size < PASSWORD_STORE_RECORDS:
+                raise ValueError(f"{path} is too short to be a password store")
+            self._map = _read_only_map(handle)
+        magic, version, record_size, count = PASSWORD_STORE_HEADER.unpack_from(self._map, 0)
+        expected = PASSWORD_STORE_RECORDS + count * PASSWORD_STORE_RECORD_SIZE
+        problem = None
+        if magic != PASSWORD_STORE_MAGIC:
+            problem = "is not a password store"
+        elif version != PASSWORD_STORE_VERSION or record_size != PASSWORD_STORE_RECORD_SIZE:
+            problem = f"has unsupported store version {version}"
+        elif len(self._map) != expected:
+            problem = "is truncated or has trailing data"
+        if problem:
+            self._map.close()
+            raise ValueError(f"{path} {problem}")
+        self._count = count
+        self._blobs: Dict[int, str] = {}
+
+    def __getitem__(self, algo: int) -> str:
+        blob = self._blobs.get(algo)
+        if blob is not None:
+            return blob
+        if not isinstance(algo, int) or not 0 <= algo <= 0xFFFF:
+            raise KeyError(algo)
+        offset, prefix = PASSWORD_STORE_SLOT.unpack_from(
+            self._map, PASSWORD_STORE_HEADER.size + algo * PASSWORD_STORE_SLOT.size)
+        if not offset:
+            raise KeyError(algo)
+        raw = self._map[offset:offset + PASSWORD_STORE_RECORD_SIZE]
+        blob = prefix.decode("ascii") + binascii.b2a_base64(raw, newline=False).decode("ascii")
+        self._blobs[algo] = blob
+        return blob
+
+    def __iter__(self) -> Iterator[int]:
+        slots = PASSWORD_STORE_SLOT.iter_unpack(
+            self._map[PASSWORD_STORE_HEADER.size:PASSWORD_STORE_RECORDS])
+        return (algo for algo, (offset, _) in enumerate(slots) if offset)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def close(self) -> None:
+        self._blobs.clear()
+        self._map.close()
+
+
+def parse_password_line(text: str) -> tuple[int, str]:
+    """Split ``ALGO BLOB`` or ``ALGO=BLOB`` (algo in decimal or 0x hex) into its parts."""
+    fields = text.split(None, 1)
+    if fields and "=" in fields[0]:
+        # Blobs may end in '=' padding, so only the first '=' separates.
+        algo, _, blob = text.strip().partition("=")
+    elif len(fields) == 2:
+        algo, blob = fields
+    else:
+        algo = blob = ""
+    if not algo.strip() or not blob.strip():
+        raise ValueError(f"Expected 'ALGO BLOB' or 'ALGO=BLOB', got {text.strip()!r}")
+    try:
+        value = int(algo.strip(), 0)
+    except ValueError as exc:
+        raise ValueError(f"Algo must be an integer, got {algo.strip()!r}") from exc
+    if not 0 <= value <= 0xFFFF:
+        raise ValueError("Algo must fit in 16 bits")
+    return value, blob.strip()
+
+
+def read_password_lines(lines: Iterable[str], source: str = "<input>") -> Dict[int, str]:
+    """Parse a text password map: one `parse_password_line` entry per line, # comments."""
+    password_map: Dict[int, str] = {}
+    for number, line in enumerate(lines, 1):
+        line = line.split("#", 1)[0].strip()
+        if not line:
+            continue
+        try:
+            algo, blob = parse_password_line(line)
+        except ValueError as exc:
+            raise ValueError(f"{source}:{number}: {exc}") from exc
+        password_map[algo] = blob
+    return password_map
+
+
+def load_password_map_file(path: str) -> Mapping[int, str]:
+    """Open a password store, or parse a text map of ``ALGO BLOB`` lines."""
+    with open(path, "rb") as handle:
+        magic = handle.read(len(PASSWORD_STORE_MAGIC))
+    if magic == PASSWORD_STORE_MAGIC:
+        return PasswordStore(path)
+    with open(path, encoding="utf-8") as handle:
+        return read_password_lines(handle, path)
+
+
+class ReloadingPasswordMap(Mapping):
+    """Password map backed by a file that is picked up again whenever it changes.
+
+    Lookups stat the file at most once per ``poll_interval`` seconds and
+    reload when its mtime, inode or size differ, e.g. after `keygen.py
+    store` atomically replaces it.  The new mapping is loaded while other
+    threads keep reading the old one, then swapped in with one assignment;
+    a file that fails to load is reported in `stats` and the old mapping
+    stays live.  Unchanged blobs keep their compiled records and warm caches
+    (see `PasswordRegistry`).
+    """
+
+    def __init__(self, path: str, poll_interval: float = 1.0) -> None:
+        self.path = path
+        self.poll_interval = poll_interval
+        self.generation = 0
+        self.reloads = 0
+        self.reload_errors = 0
+        self.last_error: str | None = None
+        self.last_reload_ms = 0.0
+        self.max_reload_ms = 0.0
+        self._lock = threading.Lock()
+        self._identity = self._stat()
+        self._current = load_password_map_file(path)
+        self._next_poll = time.monotonic() + poll_interval
+
+    def _stat(self) -> tuple[int, int, int]:
+        info = os.stat(self.path)
+        return info.st_mtime_ns, info.st_ino, info.st_size
+
+    @property
+    def current(self) -> Mapping[int, str]:
+        """The live mapping, polling the file first when the interval has elapsed."""
+        if time.monotonic() >= self._next_poll:
+            self.poll()
+        return self._current
+
+    def poll(self) -> bool:
+        """Reload if the file changed; True when a new mapping was swapped in.
+
+        Returns immediately if another thread is already reloading.
+        """
+        if not self._lock.acquire(blocking=False):
+            return False
+        try:
+            self._next_poll = time.monotonic() + self.poll_interval
+            try:
+                identity = self._stat()
+            except OSError as exc:
+                self.last_error = str(exc)
+                return False
+            if identity == self._identity:
+                return False
+            # Remember the attempt either way, so a bad file is retried only
+            # once it changes again.
+            self._identity = identity
+            return self._load()
+        finally:
+            self._lock.release()
+
+    def reload(self) -> bool:
+        """Load the file now, whether or not it looks changed."""
+        with self._lock:
+            self._identity = self._stat()
+            return self._load()
+
+    def _load(self) -> bool:
+        start = time.perf_counter()
+        try:
+            mapping = load_password_map_file(self.path)
+        except (OSError, ValueError) as exc:
+            self.reload_errors += 1
+            self.last_error = str(exc)
+            return False
+        self._current = mapping
+        self.generation += 1
+        self.reloads += 1
+        self.last_error = None
+        self.last_reload_ms = (time.perf_counter() - start) * 1000
+        self.max_reload_ms = max(self.max_reload_ms, self.last_reload_ms)
+        return True
+
+    def stats(self) -> Dict[str, object]:
+        """Reload counters and latency, plus the invalidation counters of its registry."""
+        stats: Dict[str, object] = {
+            "generation": self.generation, "reloads": self.reloads,
+            "reload_errors": self.reload_errors, "last_error": self.last_error,
+            "last_reload_ms": self.last_reload_ms, "max_reload_ms": self.max_reload_ms}
+        stats.update(registry_for(self).stats())
+        return stats
+
+    def __getitem__(self, algo: int) -> str:
+        return self.current[algo]
+
+    def get(self, algo: Any, default: Any = None) -> Any:
+        return self.current.get(algo, default)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.current)
+
+    def __len__(self) -> int:
+        return len(self.current)
+
+
+# Namespaces let one process serve several platforms whose algo ids collide.
+# Each name resolves to its own registry; `DERIVATION_CACHE` is shared.
+NAMESPACE_PATH_ENV = "KEYLIB_MAP_PATH"
+NAMESPACE_FILE_SUFFIXES = (".pws", ".txt")
+_NAMESPACES: Dict[str, PasswordRegistry] = {DEFAULT_NAMESPACE: DEFAULT_REGISTRY}
+_NAMESPACES_LOCK = threading.Lock()
+
+
+def _check_namespace_name(name: str) -> None:
+    if not name or name.startswith(".") or not all(ch.isalnum() or ch in "-_." for ch in name):
+        raise ValueError(f"Invalid map namespace {name!r}; use letters, digits, '-', '_' or '.'")
+
+
+def register_namespace(name: str, source: Mapping[int, str] | PasswordRegistry | str,
+                       poll_interval: float = 1.0) -> PasswordRegistry:
+    """Serve `source` under `name`, replacing any earlier registration.
+
+    ``source`` is a password map, a registry, or the path of a password
+    store or text map (followed with `ReloadingPasswordMap`).
+    """
+    _check_namespace_name(name)
+    if isinstance(source, str):
+        source = ReloadingPasswordMap(source, poll_interval)
+    password_map = source.password_map if isinstance(source, PasswordRegistry) else source
+    registry = PasswordRegistry(password_map, namespace=name)
+    with _NAMESPACES_LOCK:
+        _NAMESPACES[name] = registry
+    DERIVATION_CACHE.clear(name)
+    return registry
+
+
+def _namespace_dirs() -> List[str]:
+    return [part for part in os.environ.get(NAMESPACE_PATH_ENV, "").split(os.pathsep) if part]
+
+
+def namespace_registry(name: str) -> PasswordRegistry:
+    """Registry for `name`: registered ones first, then map files on `NAMESPACE_PATH_ENV`.
+
+    A namespace ``foo`` is found as ``foo.pws`` (password store) or
+    ``foo.txt`` (text map) in any of the listed directories.
+    """
+    registry = _NAMESPACES.get(name)
+    if registry is not None:
+        return registry
+    _check_namespace_name(name)
+    for directory in _namespace_dirs():
+        for suffix in NAMESPACE_FILE_SUFFIXES:
+            path = os.path.join(directory, name + suffix)
+            if os.path.isfile(path):
+                with _NAMESPACES_LOCK:
+                    if name in _NAMESPACES:
+                        return _NAMESPACES[name]
+                return register_namespace(name, path)
+    raise ValueError(f"Unknown map namespace {name!r}; known: {', '.join(namespaces())}")
+
+
+def namespaces() -> List[str]:
+    """Sorted names of registered namespaces plus map files found on `NAMESPACE_PATH_ENV`."""
+    names = set(_NAMESPACES)
+    for directory in _namespace_dirs():
+        try:
+            entries = os.listdir(directory)
+        except OSError:
+            continue
+        for entry in entries:
+            stem, suffix = os.path.splitext(entry)
+            if suffix in NAMESPACE_FILE_SUFFIXES and stem and not stem.startswith("."):
+                names.add(stem)
+    return sorted(names)
+
+
+def resolve_registry(password_map: Mapping[int, str] | PasswordRegistry | None = None,
+                     namespace: str | None = None) -> PasswordRegistry:
+    """Registry for a ``password_map`` or ``namespace`` argument (at most one may be given)."""
+    if namespace is None:
+        return registry_for(password_map)
+    if password_map is not None:
+        raise ValueError("Pass either a password map or a namespace, not both")
+    return namespace_registry(namespace)
+
+
 def bytes_to_state(block: Sequence[int]) -> List[List[int]]:
     """Convert a 16-byte block into the 4x4 matrix AES uses internally."""
     return [[block[row + 4 * col] for col in range(4)] for row in range(4)]
@@ -430,12 +1055,12 @@ def expand_key(key: bytes) -> List[List[int]]:
         words.append(new_word)
     round_keys: List[List[int]] = []
     for i in range(0, 44, 4):
-        round_keys.append(sum((words[i + j] for j in range(4)), []))
+        round_keys.append([byte for word in words[i:i + 4] for byte in word])
     return round_keys
 
 
-def aes_encrypt_block(key: bytes, block: bytes) -> bytes:
-    """Encrypt a single 16-byte block with AES-128 (no padding)."""
+def aes_encrypt_block_reference(key: bytes, block: bytes) -> bytes:
+    """Encrypt a single 16-byte block with the explicit, round-by-round AES-128."""
     if len(block) != 16:
         raise ValueError("AES block must be 16 bytes")
     round_keys = expand_key(key)
@@ -452,40 +1077,2448 @@ def aes_encrypt_block(key: bytes, block: bytes) -> bytes:
     return state_to_bytes(state)
 
 
-def run_hash_chain(secret: bytes, iterations: int) -> bytes:
+def build_t_tables() -> tuple[List[int], List[int], List[int], List[int]]:
+    """Fuse SubBytes and MixColumns into four 256-entry tables of 32-bit words.
+
+    Words are big-endian columns (row 0 in the top byte).  ``TE0[x]`` is the
+    column contributed by S-box output ``s = SBOX[x]`` sitting in row 0, i.e.
+    ``(2s, s, s, 3s)``; ``TE1``..``TE3`` are the same column rotated for rows
+    1..3, so ShiftRows reduces to picking which state word feeds each table.
+    """
+    te0: List[int] = []
+    for value in SBOX:
+        double = xtime(value)
+        te0.append((double << 24) | (value << 16) | (value << 8) | (double ^ value))
+    te1 = [((word >> 8) | (word << 24)) & 0xFFFFFFFF for word in te0]
+    te2 = [((word >> 8) | (word << 24)) & 0xFFFFFFFF for word in te1]
+    te3 = [((word >> 8) | (word << 24)) & 0xFFFFFFFF for word in te2]
+    return te0, te1, te2, te3
+
+
+@functools.lru_cache(maxsize=None)
+def t_tables() -> tuple[List[int], List[int], List[int], List[int]]:
+    """``(TE0, TE1, TE2, TE3)``, built on first use rather than at import."""
+    return build_t_tables()
+
+
+_LAZY_T_TABLES = {"TE0": 0, "TE1": 1, "TE2": 2, "TE3": 3}
+
+
+def __getattr__(name: str):
+    # ``keylib.TE0``..``TE3`` stay importable; in-module code calls `t_tables`.
+    index = _LAZY_T_TABLES.get(name)
+    if index is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return t_tables()[index]
+
+
+def expand_key_words(key: bytes) -> List[int]:
+    """Derive the 44 big-endian round-key words used by the T-table engine."""
+    if len(key) != 16:
+        raise ValueError("AES-128 key must be 16 bytes long")
+    sbox = SBOX
+    words = [int.from_bytes(key[i:i + 4], "big") for i in range(0, 16, 4)]
+    for i in range(4, 44):
+        temp = words[i - 1]
+        if i % 4 == 0:
+            temp = ((sbox[(temp >> 16) & 0xFF] << 24) | (sbox[(temp >> 8) & 0xFF] << 16)
+                    | (sbox[temp & 0xFF] << 8) | sbox[temp >> 24]) ^ (RCON[i // 4] << 24)
+        words.append(words[i - 4] ^ temp)
+    return words
+
+
+def encrypt_words_ttable(round_words: Sequence[int], block: bytes) -> bytes:
+    """Encrypt one block with flat integer state and precomputed round-key words."""
+    te0, te1, te2, te3 = t_tables()
+    sbox = SBOX
+    s0 = int.from_bytes(block[0:4], "big") ^ round_words[0]
+    s1 = int.from_bytes(block[4:8], "big") ^ round_words[1]
+    s2 = int.from_bytes(block[8:12], "big") ^ round_words[2]
+    s3 = int.from_bytes(block[12:16], "big") ^ round_words[3]
+    for k in range(4, 40, 4):
+        t0 = (te0[s0 >> 24] ^ te1[(s1 >> 16) & 0xFF] ^ te2[(s2 >> 8) & 0xFF]
+              ^ te3[s3 & 0xFF] ^ round_words[k])
+        t1 = (te0[s1 >> 24] ^ te1[(s2 >> 16) & 0xFF] ^ te2[(s3 >> 8) & 0xFF]
+              ^ te3[s0 & 0xFF] ^ round_words[k + 1])
+        t2 = (te0[s2 >> 24] ^ te1[(s3 >> 16) & 0xFF] ^ te2[(s0 >> 8) & 0xFF]
+              ^ te3[s1 & 0xFF] ^ round_words[k + 2])
+        s3 = (te0[s3 >> 24] ^ te1[(s0 >> 16) & 0xFF] ^ te2[(s1 >> 8) & 0xFF]
+              ^ te3[s2 & 0xFF] ^ round_words[k + 3])
+        s0, s1, s2 = t0, t1, t2
+    # Final round has no MixColumns, so fall back to plain S-box lookups.
+    t0 = ((sbox[s0 >> 24] << 24) | (sbox[(s1 >> 16) & 0xFF] << 16)
+          | (sbox[(s2 >> 8) & 0xFF] << 8) | sbox[s3 & 0xFF]) ^ round_words[40]
+    t1 = ((sbox[s1 >> 24] << 24) | (sbox[(s2 >> 16) & 0xFF] << 16)
+          | (sbox[(s3 >> 8) & 0xFF] << 8) | sbox[s0 & 0xFF]) ^ round_words[41]
+    t2 = ((sbox[s2 >> 24] << 24) | (sbox[(s3 >> 16) & 0xFF] << 16)
+          | (sbox[(s0 >> 8) & 0xFF] << 8) | sbox[s1 & 0xFF]) ^ round_words[42]
+    t3 = ((sbox[s3 >> 24] << 24) | (sbox[(s0 >> 16) & 0xFF] << 16)
+          | (sbox[(s1 >> 8) & 0xFF] << 8) | sbox[s2 & 0xFF]) ^ round_words[43]
+    return ((t0 << 96) | (t1 << 64) | (t2 << 32) | t3).to_bytes(16, "big")
+
+
+def aes_encrypt_block_ttable(key: bytes, block: bytes) -> bytes:
+    """Encrypt a single 16-byte block with the word-oriented T-table engine."""
+    if len(block) != 16:
+        raise ValueError("AES block must be 16 bytes")
+    return encrypt_words_ttable(expand_key_words(key), block)
+
+
+class KeySchedule:
+    """Expanded AES-128 round keys for one key, built once and reused per block.
+
+    ``words`` is a flat ``array('I')`` of the 44 big-endian round-key words,
+    which is all the T-table engine needs; ``round_keys`` rebuilds the 11
+    byte lists of the reference layout on demand.  ``mac_constants`` caches
+    the seed-independent part of `encrypt_mac_ttable` once it is first used.
+    """
+    __slots__ = ("key", "words", "mac_constants", "uses", "compiled", "fused_uses", "fused")
+
+    def __init__(self, key: bytes, words: Sequence[int] | None = None) -> None:
+        self.key = bytes(key)
+        # Callers holding already expanded round keys (a precomputed
+        # `DerivationTable`) pass them in to skip the expansion.
+        self.words = array("I", expand_key_words(self.key) if words is None else words)
+        self.mac_constants: tuple[int, int, int, int, int, int] | None = None
+        # Bookkeeping for `CompiledKeyCache`: blocks encrypted so far, and the
+        # (encrypt_block, encrypt_mac) pair once this key has been promoted.
+        self.uses = 0
+        self.compiled: tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]] | None = None
+        # The same for the opt-in `FusedTableCache` tier, which counts its own
+        # uses so demotion from one tier leaves the other's count alone.
+        self.fused_uses = 0
+        self.fused: tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]] | None = None
+
+    def round_key_bytes(self) -> bytes:
+        """Return all 11 round keys as one flat 176-byte string."""
+        return struct.pack(">44I", *self.words)
+
+    def round_keys(self) -> List[List[int]]:
+        """Return the schedule in the 11 x 16 byte layout of `expand_key`."""
+        flat = self.round_key_bytes()
+        return [list(flat[i:i + 16]) for i in range(0, 176, 16)]
+
+    def __repr__(self) -> str:
+        return f"KeySchedule({self.key.hex()})"
+
+
+class KeyScheduleCache:
+    """Bounded LRU of `KeySchedule` objects keyed by AES key, with hit/miss counters."""
+
+    def __init__(self, maxsize: int = 4096) -> None:
+        if maxsize < 1:
+            raise ValueError("Key schedule cache needs room for at least one entry")
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[bytes, KeySchedule] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: bytes, round_key_bytes: bytes | None = None) -> KeySchedule:
+        """Return the cached schedule for `key`, expanding it on a miss.
+
+        ``round_key_bytes`` (the 176-byte `KeySchedule.round_key_bytes`
+        layout) is used instead of expanding when the key is not cached.
+        """
+        key = bytes(key)
+        with self._lock:
+            schedule = self._entries.get(key)
+            if schedule is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return schedule
+        words = None if round_key_bytes is None else struct.unpack(">44I", round_key_bytes)
+        schedule = KeySchedule(key, words)
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = schedule
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return schedule
+
+    def discard(self, key: bytes) -> bool:
+        """Forget the schedule for `key`; True if it was cached."""
+        with self._lock:
+            return self._entries.pop(bytes(key), None) is not None
+
+    def clear(self) -> None:
+        """Drop every cached schedule and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Snapshot of size and hit/miss counters for diagnostics."""
+        with self._lock:
+            return {"size": len(self._entries), "maxsize": self.maxsize,
+                    "hits": self.hits, "misses": self.misses}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+SCHEDULE_CACHE = KeyScheduleCache()
+
+
+def get_key_schedule(key: bytes) -> KeySchedule:
+    """Fetch the expanded schedule for `key` through the shared LRU cache."""
+    return SCHEDULE_CACHE.get(key)
+
+
+# The derivation always encrypts 11 bytes of 0xFF followed by the 5-byte seed.
+MAC_BLOCK_PREFIX = b"\xff" * 11
+
+
+def mac_round1_constants(words: Sequence[int]) -> tuple[int, int, int, int, int, int]:
+    """Precompute the seed-independent part of round 1 for MAC-shaped blocks.
+
+    After AddRoundKey, columns 0 and 1 and the top three bytes of column 2
+    are fixed by the 0xFF prefix, so 10 of round 1's 16 table lookups do not
+    depend on the seed.  Returns their XOR per output column plus the round
+    key bytes the seed is combined with.
+    """
+    te0, te1, te2, te3 = t_tables()
+    s0 = 0xFFFFFFFF ^ words[0]
+    s1 = 0xFFFFFFFF ^ words[1]
+    s2 = 0xFFFFFF00 ^ words[2]  # the low byte is replaced by seed[0] at run time
+    return (te0[s0 >> 24] ^ te1[(s1 >> 16) & 0xFF] ^ te2[(s2 >> 8) & 0xFF] ^ words[4],
+            te0[s1 >> 24] ^ te1[(s2 >> 16) & 0xFF] ^ te3[s0 & 0xFF] ^ words[5],
+            te0[s2 >> 24] ^ te2[(s0 >> 8) & 0xFF] ^ te3[s1 & 0xFF] ^ words[6],
+            te1[(s0 >> 16) & 0xFF] ^ te2[(s1 >> 8) & 0xFF] ^ words[7],
+            words[2] & 0xFF, words[3])
+
+
+def encrypt_mac_ttable(schedule: KeySchedule, seed: bytes) -> bytes:
+    """Return the first 5 bytes of ``AES(MAC_BLOCK_PREFIX + seed)`` with less work.
+
+    Round 1 only performs the 6 seed-dependent lookups on top of
+    `mac_round1_constants`, and the final round computes just output column 0
+    and the top byte of column 1, the only bytes the truncated MAC keeps.
+    """
+    if len(seed) != 5:
+        raise ValueError("Seed must be exactly 5 bytes")
+    constants = schedule.mac_constants
+    if constants is None:
+        constants = schedule.mac_constants = mac_round1_constants(schedule.words)
+    c0, c1, c2, c3, key_byte, key_word = constants
+    round_words = schedule.words
+    te0, te1, te2, te3 = t_tables()
+    sbox = SBOX
+    tail = int.from_bytes(seed[1:5], "big") ^ key_word
+    s0 = c0 ^ te3[tail & 0xFF]
+    s1 = c1 ^ te2[(tail >> 8) & 0xFF]
+    s2 = c2 ^ te1[(tail >> 16) & 0xFF]
+    s3 = c3 ^ te0[tail >> 24] ^ te3[seed[0] ^ key_byte]
+    for k in range(8, 40, 4):
+        t0 = (te0[s0 >> 24] ^ te1[(s1 >> 16) & 0xFF] ^ te2[(s2 >> 8) & 0xFF]
+              ^ te3[s3 & 0xFF] ^ round_words[k])
+        t1 = (te0[s1 >> 24] ^ te1[(s2 >> 16) & 0xFF] ^ te2[(s3 >> 8) & 0xFF]
+              ^ te3[s0 & 0xFF] ^ round_words[k + 1])
+        t2 = (te0[s2 >> 24] ^ te1[(s3 >> 16) & 0xFF] ^ te2[(s0 >> 8) & 0xFF]
+              ^ te3[s1 & 0xFF] ^ round_words[k + 2])
+        s3 = (te0[s3 >> 24] ^ te1[(s0 >> 16) & 0xFF] ^ te2[(s1 >> 8) & 0xFF]
+              ^ te3[s2 & 0xFF] ^ round_words[k + 3])
+        s0, s1, s2 = t0, t1, t2
+    column0 = ((sbox[s0 >> 24] << 24) | (sbox[(s1 >> 16) & 0xFF] << 16)
+               | (sbox[(s2 >> 8) & 0xFF] << 8) | sbox[s3 & 0xFF]) ^ round_words[40]
+    byte4 = sbox[s1 >> 24] ^ (round_words[41] >> 24)
+    return ((column0 << 8) | byte4).to_bytes(5, "big")
+
+
+def _unrolled_rounds(words: Sequence[int], first: int, prefix: str) -> tuple[List[str], str]:
+    """Source lines for T-table rounds `first`..9, alternating variable prefixes."""
+    lines: List[str] = []
+    names = {"s": "t", "t": "s"}
+    for rnd in range(first, 10):
+        out = names[prefix]
+        a, b, c, d = (f"{prefix}{i}" for i in range(4))
+        for col, (w, x, y, z) in enumerate(((a, b, c, d), (b, c, d, a), (c, d, a, b),
+                                             (d, a, b, c))):
+            lines.append(f"    {out}{col} = (te0[{w} >> 24] ^ te1[({x} >> 16) & 255] "
+                         f"^ te2[({y} >> 8) & 255] ^ te3[{z} & 255] "
+                         f"^ {words[4 * rnd + col]:#010x})")
+        prefix = out
+    return lines, prefix
+
+
+def _final_column(prefix: str, col: int, word: int) -> str:
+    w, x, y, z = (f"{prefix}{(col + i) % 4}" for i in range(4))
+    return (f"((sbox[{w} >> 24] << 24) | (sbox[({x} >> 16) & 255] << 16) "
+            f"| (sbox[({y} >> 8) & 255] << 8) | sbox[{z} & 255]) ^ {word:#010x}")
+
+
+def unrolled_aes_source(words: Sequence[int]) -> str:
+    """Emit Python source for one key's ``encrypt_block`` and ``encrypt_mac``.
+
+    Both are the T-table engine with all rounds unrolled and the round-key
+    words written as integer literals, so the hot loop does no indexing into
+    the schedule.  ``encrypt_mac`` mirrors `encrypt_mac_ttable`.  Inputs are
+    not length-checked; callers validate first.
+    """
+    header = ", te0=TE0, te1=TE1, te2=TE2, te3=TE3, sbox=SBOX, from_bytes=int.from_bytes):"
+    lines = ["def encrypt_block(block" + header]
+    lines += [f"    s{i} = from_bytes(block[{4 * i}:{4 * i + 4}], 'big') ^ {words[i]:#010x}"
+              for i in range(4)]
+    rounds, prefix = _unrolled_rounds(words, 1, "s")
+    lines += rounds
+    lines += [f"    r{col} = {_final_column(prefix, col, words[40 + col])}" for col in range(4)]
+    lines.append("    return ((r0 << 96) | (r1 << 64) | (r2 << 32) | r3).to_bytes(16, 'big')")
+
+    c0, c1, c2, c3, key_byte, key_word = mac_round1_constants(words)
+    lines += ["", "", "def encrypt_mac(seed" + header,
+              f"    tail = from_bytes(seed[1:5], 'big') ^ {key_word:#010x}",
+              f"    s0 = {c0:#010x} ^ te3[tail & 255]",
+              f"    s1 = {c1:#010x} ^ te2[(tail >> 8) & 255]",
+              f"    s2 = {c2:#010x} ^ te1[(tail >> 16) & 255]",
+              f"    s3 = {c3:#010x} ^ te0[tail >> 24] ^ te3[seed[0] ^ {key_byte:#04x}]"]
+    rounds, prefix = _unrolled_rounds(words, 2, "s")
+    lines += rounds
+    lines.append(f"    r0 = {_final_column(prefix, 0, words[40])}")
+    lines.append(f"    r1 = sbox[{prefix}1 >> 24] ^ {words[41] >> 24:#04x}")
+    lines.append("    return ((r0 << 8) | r1).to_bytes(5, 'big')")
+    return "\n".join(lines) + "\n"
+
+
+def compile_key_functions(schedule: KeySchedule
+                          ) -> tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]:
+    """Compile `unrolled_aes_source` for `schedule`; returns (encrypt_block, encrypt_mac)."""
+    te0, te1, te2, te3 = t_tables()
+    namespace: Dict[str, Any] = {"TE0": te0, "TE1": te1, "TE2": te2, "TE3": te3, "SBOX": SBOX}
+    code = compile(unrolled_aes_source(schedule.words), f"<aes-unrolled {schedule.key.hex()}>",
+                   "exec")
+    exec(code, namespace)
+    return namespace["encrypt_block"], namespace["encrypt_mac"]
+
+
+class CompiledKeyCache:
+    """Promotes hot key schedules to compiled, unrolled per-key functions.
+
+    A schedule is compiled once it has encrypted ``promote_after`` blocks
+    through the T-table backend.  At most ``max_functions`` keys stay
+    compiled; the least recently used one is demoted (and must earn its
+    promotion again) when a new key is promoted past the limit.
+    """
+
+    def __init__(self, promote_after: int = 1024, max_functions: int = 64) -> None:
+        if promote_after < 0:
+            raise ValueError("Promotion threshold cannot be negative")
+        if max_functions < 0:
+            raise ValueError("Compiled function limit cannot be negative")
+        self.promote_after = promote_after
+        self.max_functions = max_functions
+        self.promotions = 0
+        self.demotions = 0
+        self._compiled: OrderedDict[bytes, KeySchedule] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup(self, schedule: KeySchedule, count: int = 1
+               ) -> tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]] | None:
+        """Record `count` uses of `schedule` and return its compiled pair, if any."""
+        schedule.uses += count
+        compiled = schedule.compiled
+        if compiled is not None:
+            try:
+                self._compiled.move_to_end(schedule.key)
+            except KeyError:
+                pass  # demoted concurrently; the functions are still valid for this call
+            return compiled
+        if schedule.uses < self.promote_after or not self.max_functions:
+            return None
+        return self.promote(schedule)
+
+    def promote(self, schedule: KeySchedule
+                ) -> tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]:
+        """Compile `schedule` now, demoting the least recently used key if over the limit."""
+        with self._lock:
+            if schedule.compiled is None:
+                schedule.compiled = compile_key_functions(schedule)
+                self.promotions += 1
+            self._compiled[schedule.key] = schedule
+            while len(self._compiled) > self.max_functions:
+                _, demoted = self._compiled.popitem(last=False)
+                demoted.compiled = None
+                demoted.uses = 0
+                self.demotions += 1
+            return schedule.compiled
+
+    def discard(self, key: bytes) -> bool:
+        """Drop `key`'s compiled functions, keeping its use count (not a demotion).
+
+        Returns True if the key was compiled.
+        """
+        with self._lock:
+            schedule = self._compiled.pop(bytes(key), None)
+            if schedule is None:
+                return False
+            schedule.compiled = None
+            return True
+
+    def clear(self) -> None:
+        """Demote every compiled key and reset the counters."""
+        with self._lock:
+            for schedule in self._compiled.values():
+                schedule.compiled = None
+                schedule.uses = 0
+            self._compiled.clear()
+            self.promotions = 0
+            self.demotions = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Snapshot of compiled-key count, limit, and promotion/demotion counters."""
+        with self._lock:
+            return {"compiled": len(self._compiled), "max_functions": self.max_functions,
+                    "promote_after": self.promote_after, "promotions": self.promotions,
+                    "demotions": self.demotions}
+
+
+COMPILED_KEYS = CompiledKeyCache()
+
+
+@functools.lru_cache(maxsize=None)
+def _shifted_bytes() -> List[List[int]]:
+    """``[row][b] = b << (24 - 8 * row)``: every value a final-round fused table holds."""
+    return [[value << (24 - 8 * row) for value in range(256)] for row in range(4)]
+
+
+def build_fused_tables(words: Sequence[int]
+                       ) -> tuple[List[List[List[int]]], List[List[int]]]:
+    """Fold one key's round keys into per-round, per-byte-position lookup tables.
+
+    Round ``r`` (1..9) gets 16 tables ``T[4*col + row][v] = TE_row[v ^ k]``,
+    where ``k`` is the round ``r - 1`` key byte that the T-table engine would
+    XOR into that input byte, so AddRoundKey disappears from the inner loop.
+    The 16 final-round tables hold ``SBOX[v ^ k9] ^ k10`` pre-shifted into
+    their output byte.  Returns ``(rounds, final)``.
+
+    Each table is a permutation of a shared list (`t_tables` or
+    `_shifted_bytes`) and references its int objects instead of creating new
+    ones, so a key costs only the 160 lists themselves (`fused_table_bytes`).
+    """
+    tables = t_tables()
+    shifted = _shifted_bytes()
+    key_bytes = [[(words[4 * rnd + col] >> (24 - 8 * row)) & 0xFF
+                  for col in range(4) for row in range(4)] for rnd in range(10)]
+    sources = [4 * ((col + row) % 4) + row for col in range(4) for row in range(4)]
+    rounds: List[List[List[int]]] = []
+    for rnd in range(1, 10):
+        previous = key_bytes[rnd - 1]
+        rounds.append([[tables[pos % 4][value ^ previous[src]] for value in range(256)]
+                       for pos, src in enumerate(sources)])
+    final = []
+    for pos, src in enumerate(sources):
+        row, skip = pos % 4, key_bytes[9][src]
+        out = (words[40 + pos // 4] >> (24 - 8 * row)) & 0xFF
+        final.append([shifted[row][SBOX[value ^ skip] ^ out] for value in range(256)])
+    return rounds, final
+
+
+def fused_aes_source() -> str:
+    """Emit key-independent source for ``encrypt_block`` / ``encrypt_mac`` over fused tables.
+
+    The tables are bound as default arguments (``R<round>_<pos>``, ``F_<pos>``),
+    so one compiled code object serves every key; only the namespace differs.
+    ``C0``..``C3`` are the seed-independent parts of round 1 for MAC blocks.
+    """
+    names = [f"r{rnd}_{pos}" for rnd in range(1, 10) for pos in range(16)]
+    names += [f"f_{pos}" for pos in range(16)]
+    header = (", " + ", ".join(f"{name}={name.upper()}" for name in names)
+              + ", c0=C0, c1=C1, c2=C2, c3=C3, from_bytes=int.from_bytes):")
+
+    def rounds(first: int) -> tuple[List[str], str]:
+        lines, prefix = [], "s"
+        for rnd in range(first, 10):
+            out = "t" if prefix == "s" else "s"
+            for col in range(4):
+                w, x, y, z = (f"{prefix}{(col + row) % 4}" for row in range(4))
+                p = 4 * col
+                lines.append(f"    {out}{col} = (r{rnd}_{p}[{w} >> 24] "
+                             f"^ r{rnd}_{p + 1}[({x} >> 16) & 255]"
+                             f" ^ r{rnd}_{p + 2}[({y} >> 8) & 255] ^ r{rnd}_{p + 3}[{z} & 255])")
+            prefix = out
+        return lines, prefix
+
+    def final(prefix: str, col: int) -> str:
+        w, x, y, z = (f"{prefix}{(col + row) % 4}" for row in range(4))
+        p = 4 * col
+        return (f"(f_{p}[{w} >> 24] | f_{p + 1}[({x} >> 16) & 255] | f_{p + 2}[({y} >> 8) & 255]"
+                f" | f_{p + 3}[{z} & 255])")
+
+    lines = ["def encrypt_block(block" + header]
+    lines += [f"    s{i} = from_bytes(block[{4 * i}:{4 * i + 4}], 'big')" for i in range(4)]
+    body, prefix = rounds(1)
+    lines += body
+    lines += [f"    o{col} = {final(prefix, col)}" for col in range(4)]
+    lines.append("    return ((o0 << 96) | (o1 << 64) | (o2 << 32) | o3).to_bytes(16, 'big')")
+    # Round 1 of a MAC block: only seed bytes vary, and they index the tables directly.
+    lines += ["", "", "def encrypt_mac(seed" + header,
+              "    s0 = c0 ^ r1_3[seed[4]]",
+              "    s1 = c1 ^ r1_6[seed[3]]",
+              "    s2 = c2 ^ r1_9[seed[2]]",
+              "    s3 = c3 ^ r1_12[seed[1]] ^ r1_15[seed[0]]"]
+    body, prefix = rounds(2)
+    lines += body
+    lines.append(f"    o0 = {final(prefix, 0)}")
+    lines.append(f"    o1 = f_4[{prefix}1 >> 24] >> 24")
+    lines.append("    return ((o0 << 8) | o1).to_bytes(5, 'big')")
+    return "\n".join(lines) + "\n"
+
+
+@functools.lru_cache(maxsize=None)
+def _fused_code() -> CodeType:
+    return compile(fused_aes_source(), "<aes-fused>", "exec")
+
+
+def fused_table_bytes() -> int:
+    """Memory one key's fused tables occupy: 160 lists of 256 shared int references."""
+    return 160 * sys.getsizeof([value for value in range(256)])
+
+
+def compile_fused_functions(schedule: KeySchedule
+                            ) -> tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]:
+    """Build `schedule`'s fused tables and bind them to the shared fused code."""
+    rounds, final = build_fused_tables(schedule.words)
+    namespace: Dict[str, Any] = {f"F_{pos}": table for pos, table in enumerate(final)}
+    for rnd, tables in enumerate(rounds, start=1):
+        namespace.update((f"R{rnd}_{pos}", table) for pos, table in enumerate(tables))
+    first = rounds[0]
+    namespace.update(C0=first[0][0xFF] ^ first[1][0xFF] ^ first[2][0xFF],
+                     C1=first[4][0xFF] ^ first[5][0xFF] ^ first[7][0xFF],
+                     C2=first[8][0xFF] ^ first[10][0xFF] ^ first[11][0xFF],
+                     C3=first[13][0xFF] ^ first[14][0xFF])
+    exec(_fused_code(), namespace)
+    return namespace["encrypt_block"], namespace["encrypt_mac"]
+
+
+class FusedTableCache:
+    """Opt-in tier of key-dependent fused tables for the very hottest keys.
+
+    Disabled while ``budget_bytes`` is 0.  Once enabled, keys can be added
+    explicitly with `add`, and any key reaching ``promote_after`` uses through
+    the T-table backend while the tier is enabled is promoted automatically.  When the tables held
+    exceed the budget, the least recently used key is demoted.
+    """
+
+    def __init__(self, budget_bytes: int = 0, promote_after: int = 65536) -> None:
+        if budget_bytes < 0:
+            raise ValueError("Fused table budget cannot be negative")
+        self.budget_bytes = budget_bytes
+        self.promote_after = promote_after
+        self.promotions = 0
+        self.demotions = 0
+        self._keys: OrderedDict[bytes, KeySchedule] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def configure(self, budget_bytes: int | None = None, promote_after: int | None = None
+                  ) -> None:
+        """Change the budget or promotion threshold, demoting keys that no longer fit."""
+        if budget_bytes is not None and budget_bytes < 0:
+            raise ValueError("Fused table budget cannot be negative")
+        with self._lock:
+            if budget_bytes is not None:
+                self.budget_bytes = budget_bytes
+            if promote_after is not None:
+                self.promote_after = promote_after
+            self._enforce_budget()
+
+    @property
+    def used_bytes(self) -> int:
+        return len(self._keys) * fused_table_bytes()
+
+    def _enforce_budget(self) -> None:
+        per_key = fused_table_bytes()
+        while self._keys and len(self._keys) * per_key > self.budget_bytes:
+            _, demoted = self._keys.popitem(last=False)
+            demoted.fused = None
+            demoted.fused_uses = 0
+            self.demotions += 1
+
+    def add(self, key: KeySchedule | bytes
+            ) -> tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]] | None:
+        """Build fused tables for `key` now; returns None if the budget cannot hold one key."""
+        schedule = key if isinstance(key, KeySchedule) else get_key_schedule(key)
+        if fused_table_bytes() > self.budget_bytes:
+            return None
+        functions = schedule.fused or compile_fused_functions(schedule)
+        with self._lock:
+            if schedule.fused is None:
+                schedule.fused = functions
+                self.promotions += 1
+                # The fused pair supersedes the compiled one while the key stays here.
+                COMPILED_KEYS.discard(schedule.key)
+            self._keys[schedule.key] = schedule
+            self._keys.move_to_end(schedule.key)
+            self._enforce_budget()
+        return schedule.fused
+
+    def lookup(self, schedule: KeySchedule, count: int = 1
+               ) -> tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]] | None:
+        """Record `count` uses of `schedule`; return its fused pair, promoting it if hot enough."""
+        schedule.fused_uses += count
+        fused = schedule.fused
+        if fused is not None:
+            try:
+                self._keys.move_to_end(schedule.key)
+            except KeyError:
+                pass
+            return fused
+        if self.budget_bytes and schedule.fused_uses >= self.promote_after:
+            return self.add(schedule)
+        return None
+
+    def discard(self, key: bytes) -> bool:
+        """Drop `key`'s fused tables without counting a demotion; True if it had any."""
+        with self._lock:
+            schedule = self._keys.pop(bytes(key), None)
+            if schedule is None:
+                return False
+            schedule.fused = None
+            schedule.fused_uses = 0
+            return True
+
+    def clear(self) -> None:
+        """Demote every key and reset the counters."""
+        with self._lock:
+            for schedule in self._keys.values():
+                schedule.fused = None
+                schedule.fused_uses = 0
+            self._keys.clear()
+            self.promotions = 0
+            self.demotions = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Snapshot of keys held, bytes used against the budget, and counters."""
+        with self._lock:
+            return {"keys": len(self._keys), "used_bytes": self.used_bytes,
+                    "budget_bytes": self.budget_bytes, "promote_after": self.promote_after,
+                    "promotions": self.promotions, "demotions": self.demotions}
+
+
+FUSED_TABLES = FusedTableCache()
+
+
+def _hot_key_functions(schedule: KeySchedule
+                       ) -> tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]] | None:
+    """Fastest specialised (encrypt_block, encrypt_mac) pair for `schedule`, if it has one.
+
+    The fused tier answers first; only its misses count towards (and can
+    trigger) compiled promotion, so a key is never held by both tiers.
+    """
+    if FUSED_TABLES.budget_bytes or schedule.fused is not None:
+        fused = FUSED_TABLES.lookup(schedule)
+        if fused is not None:
+            return fused
+    return COMPILED_KEYS.lookup(schedule)
+
+
+def _index_schedules(schedules: Sequence[KeySchedule]) -> tuple[List[KeySchedule], List[int]]:
+    """Collapse repeated schedules: return the distinct ones and a row index per block."""
+    rows: Dict[int, int] = {}
+    distinct: List[KeySchedule] = []
+    index: List[int] = []
+    for schedule in schedules:
+        row = rows.get(id(schedule))
+        if row is None:
+            row = rows[id(schedule)] = len(distinct)
+            distinct.append(schedule)
+        index.append(row)
+    return distinct, index
+
+
+@functools.lru_cache(maxsize=None)
+def load_numpy():  # -> numpy module | None
+    """Import NumPy on first use; return None when it is not installed."""
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def _require_numpy(feature: str = "The numpy AES engine"):
+    numpy = load_numpy()
+    if numpy is None:
+        raise ValueError(f"{feature} requires NumPy to be installed")
+    return numpy
+
+
+# Byte i of a block is row i % 4, column i // 4.  SHIFT_ROWS_INDEX[i] is the
+# source byte ShiftRows moves into position i; ROW_ROTATIONS[k][i] is the byte
+# k rows below i in the same column, as MixColumns needs.
+SHIFT_ROWS_INDEX = [(i % 4) + 4 * ((i // 4 + i % 4) % 4) for i in range(16)]
+ROW_ROTATIONS = [[((i % 4 + k) % 4) + 4 * (i // 4) for i in range(16)] for k in range(4)]
+
+
+@functools.lru_cache(maxsize=None)
+def _numpy_tables():  # -> tuple of numpy arrays
+    numpy = _require_numpy()
+    sbox = numpy.array(SBOX, dtype=numpy.uint8)
+    sbox2 = numpy.array([xtime(value) for value in SBOX], dtype=numpy.uint8)
+    return (sbox, sbox2, sbox2 ^ sbox, numpy.array(SHIFT_ROWS_INDEX),
+            numpy.array(ROW_ROTATIONS[1]), numpy.array(ROW_ROTATIONS[2]),
+            numpy.array(ROW_ROTATIONS[3]))
+
+
+def aes_encrypt_blocks_numpy(round_keys, blocks):
+    """Encrypt an (N, 16) uint8 array of blocks, one AES state per row.
+
+    ``round_keys`` is a (176,) uint8 array shared by every row or an (N, 176)
+    array giving each row its own key (see `KeySchedule.round_key_bytes`).
+    SubBytes and ShiftRows are fancy-indexing gathers, and MixColumns uses
+    ``2*S[x]`` / ``3*S[x]`` lookup tables over the whole batch.  Returns a new
+    (N, 16) uint8 array.
+    """
+    sbox, sbox2, sbox3, shift, rot1, rot2, rot3 = _numpy_tables()
+    state = blocks ^ round_keys[..., 0:16]
+    for offset in range(16, 160, 16):
+        shifted = state[:, shift]
+        subbed = sbox[shifted]
+        state = sbox2[shifted] ^ sbox3[shifted[:, rot1]] ^ subbed[:, rot2] ^ subbed[:, rot3]
+        state ^= round_keys[..., offset:offset + 16]
+    return sbox[state[:, shift]] ^ round_keys[..., 160:176]
+
+
+# Below this many blocks the per-call NumPy overhead outweighs vectorization.
+NUMPY_BATCH_THRESHOLD = 32
+
+
+def _bitsliced_sbox(u0: int, u1: int, u2: int, u3: int, u4: int, u5: int, u6: int, u7: int,
+                    ones: int) -> tuple[int, int, int, int, int, int, int, int]:
+    """Evaluate the AES S-box as a boolean circuit on bitsliced lanes.
+
+    This is the 113-gate Boyar-Peralta circuit (32 AND, 77 XOR, 4 XNOR).
+    ``u0`` and ``s0`` are the most significant input and output bits;
+    ``ones`` is an all-lanes mask used to express XNOR.
+    """
+    # Top linear layer.
+    t1, t2, t3, t4, t5 = u0 ^ u3, u0 ^ u5, u0 ^ u6, u3 ^ u5, u4 ^ u6
+    t6, t7 = t1 ^ t5, u1 ^ u2
+    t8, t9, t10 = u7 ^ t6, u7 ^ t7, t6 ^ t7
+    t11, t12, t13 = u1 ^ u5, u2 ^ u5, t3 ^ t4
+    t14, t15, t16 = t6 ^ t11, t5 ^ t11, t5 ^ t12
+    t17, t18 = t9 ^ t16, u3 ^ u7
+    t19, t21 = t7 ^ t18, u6 ^ u7
+    t20, t22 = t1 ^ t19, t7 ^ t21
+    t23, t24, t25 = t2 ^ t22, t2 ^ t10, t20 ^ t17
+    t26, t27 = t3 ^ t16, t1 ^ t12
+    # Shared nonlinear middle (GF(2^4) inversion).
+    m1, m2, m4 = t13 & t6, t23 & t8, t19 & u7
+    m3, m5 = t14 ^ m1, m4 ^ m1
+    m6, m7, m9 = t3 & t16, t22 & t9, t20 & t17
+    m8, m10 = t26 ^ m6, m9 ^ m6
+    m11, m12, m14 = t1 & t15, t4 & t27, t2 & t10
+    m13, m15 = m12 ^ m11, m14 ^ m11
+    m16, m17, m18, m19 = m3 ^ m2, m5 ^ t24, m8 ^ m7, m10 ^ m15
+    m20, m21, m22, m23 = m16 ^ m13, m17 ^ m15, m18 ^ m13, m19 ^ t25
+    m24, m25, m27, m31, m34 = m22 ^ m23, m22 & m20, m20 ^ m21, m20 & m23, m21 & m22
+    m26, m28, m32, m33, m35, m36 = m21 ^ m25, m23 ^ m25, m27 & m31, m27 ^ m25, m24 & m34, m24 ^ m25
+    m29, m30 = m28 & m27, m26 & m24
+    m37, m38, m39, m40 = m21 ^ m29, m32 ^ m33, m23 ^ m30, m35 ^ m36
+    m41, m42, m43, m44 = m38 ^ m40, m37 ^ m39, m37 ^ m38, m39 ^ m40
+    m45 = m42 ^ m41
+    m46, m47, m48, m49, m50, m51 = m44 & t6, m40 & t8, m39 & u7, m43 & t16, m38 & t9, m37 & t17
+    m52, m53, m54, m55, m56, m57 = m42 & t15, m45 & t27, m41 & t10, m44 & t13, m40 & t23, m39 & t19
+    m58, m59, m60, m61, m62, m63 = m43 & t3, m38 & t22, m37 & t20, m42 & t1, m45 & t4, m41 & t2
+    # Bottom linear layer.
+    l0, l1, l2, l3, l4 = m61 ^ m62, m50 ^ m56, m46 ^ m48, m47 ^ m55, m54 ^ m58
+    l5, l8, l9, l12, l14 = m49 ^ m61, m51 ^ m59, m52 ^ m53, m48 ^ m51, m52 ^ m61
+    l6, l7, l10, l11, l13 = m62 ^ l5, m46 ^ l3, m53 ^ l4, m60 ^ l2, m50 ^ l0
+    l15, l16, l17, l18, l19 = m55 ^ l1, m56 ^ l0, m57 ^ l1, m58 ^ l8, m63 ^ l4
+    l20, l21, l22, l23, l24 = l0 ^ l1, l1 ^ l7, l3 ^ l12, l18 ^ l2, l15 ^ l9
+    l25, l26, l27, l28, l29 = l6 ^ l10, l7 ^ l9, l8 ^ l10, l11 ^ l14, l11 ^ l17
+    return (l6 ^ l24, l16 ^ l26 ^ ones, l19 ^ l28 ^ ones, l6 ^ l21,
+            l20 ^ l22, l25 ^ l29, l13 ^ l27 ^ ones, l6 ^ l23 ^ ones)
+
+
+def _repeat_bits(pattern: int, period: int, count: int) -> int:
+    """Tile a `period`-bit pattern `count` times across one big integer."""
+    return pattern * int.from_bytes((b"\x01" + bytes(period // 8 - 1)) * count, "little")
+
+
+def _lane_permutation(lanes: int, source: Sequence[int]) -> List[tuple[int, int]]:
+    """Turn a 16-position byte permutation into (shift, mask) steps over packed lanes."""
+    steps: Dict[int, int] = {}
+    for dest, src in enumerate(source):
+        steps[src - dest] = steps.get(src - dest, 0) | (1 << dest)
+    return [(shift, _repeat_bits(mask, 16, lanes)) for shift, mask in sorted(steps.items())]
+
+
+def _permute_lanes(value: int, steps: Sequence[tuple[int, int]]) -> int:
+    out = 0
+    for shift, mask in steps:
+        out |= ((value >> shift) if shift >= 0 else (value << -shift)) & mask
+    return out
+
+
+class _BitslicedLayout:
+    """Masks for a given lane count, cached because building them is O(lanes)."""
+    __slots__ = ("lanes", "ones", "shift_rows", "rotate1", "rotate2", "transpose")
+
+    def __init__(self, lanes: int) -> None:
+        self.lanes = lanes
+        self.ones = (1 << (16 * lanes)) - 1
+        self.shift_rows = _lane_permutation(lanes, SHIFT_ROWS_INDEX)
+        self.rotate1 = _lane_permutation(lanes, ROW_ROTATIONS[1])
+        self.rotate2 = _lane_permutation(lanes, ROW_ROTATIONS[2])
+        # Delta-swap masks for transposing the 8x8 bit matrix in every 64-bit word.
+        words = 2 * lanes
+        self.transpose = [(7, _repeat_bits(0x00AA00AA00AA00AA, 64, words)),
+                          (14, _repeat_bits(0x0000CCCC0000CCCC, 64, words)),
+                          (28, _repeat_bits(0x00000000F0F0F0F0, 64, words))]
+
+    def transpose8(self, value: int) -> int:
+        """Swap bit j of byte i with bit i of byte j inside every 8-byte word."""
+        for shift, mask in self.transpose:
+            swap = (value ^ (value >> shift)) & mask
+            value ^= swap ^ (swap << shift)
+        return value
+
+    def pack(self, data: bytes) -> List[int]:
+        """Split 16-byte blocks into 8 slices.
+
+        Bit ``16*lane + pos`` of slice b is bit b of that block byte.
+        """
+        raw = self.transpose8(int.from_bytes(data, "little")).to_bytes(len(data), "little")
+        return [int.from_bytes(raw[bit::8], "little") for bit in range(8)]
+
+    def unpack(self, slices: Sequence[int]) -> bytes:
+        """Inverse of `pack`."""
+        length = 16 * self.lanes
+        raw = bytearray(length)
+        for bit, value in enumerate(slices):
+            raw[bit::8] = value.to_bytes(length // 8, "little")
+        return self.transpose8(int.from_bytes(raw, "little")).to_bytes(length, "little")
+
+
+@functools.lru_cache(maxsize=16)
+def _bitsliced_layout(lanes: int) -> _BitslicedLayout:
+    return _BitslicedLayout(lanes)
+
+
+def _bitsliced_round_keys(schedules: Sequence[KeySchedule], layout: _BitslicedLayout
+                          ) -> List[List[int]]:
+    distinct, index = _index_schedules(schedules)
+    if len(distinct) == 1:
+        # One shared key: pack a single lane and tile it, instead of packing N copies.
+        single = _bitsliced_layout(1)
+        flat = distinct[0].round_key_bytes()
+        return [[_repeat_bits(value, 16, layout.lanes)
+                 for value in single.pack(flat[offset:offset + 16])]
+                for offset in range(0, 176, 16)]
+    flats = [schedule.round_key_bytes() for schedule in distinct]
+    return [layout.pack(b"".join(flats[row][offset:offset + 16] for row in index))
+            for offset in range(0, 176, 16)]
+
+
+def aes_encrypt_blocks_bitsliced(schedules: Sequence[KeySchedule], blocks: Sequence[bytes]
+                                 ) -> List[bytes]:
+    """Encrypt many blocks at once with bitsliced AES over Python big integers.
+
+    The batch is held as 8 integers, one per bit position, in which each block
+    occupies a 16-bit lane (one bit per state byte).  Every S-box gate and
+    MixColumns XOR therefore processes all lanes in a single integer
+    operation, and ShiftRows is a handful of shift-and-mask steps.  One
+    schedule per block; repeat the same object to share a key.
+    """
+    if len(schedules) != len(blocks):
+        raise ValueError("Need exactly one key schedule per block")
+    if not blocks:
+        return []
+    if any(len(block) != 16 for block in blocks):
+        raise ValueError("AES block must be 16 bytes")
+    layout = _bitsliced_layout(len(blocks))
+    ones, shift_rows, rotate1, rotate2 = (layout.ones, layout.shift_rows, layout.rotate1,
+                                          layout.rotate2)
+    round_keys = _bitsliced_round_keys(schedules, layout)
+    state = [value ^ key for value, key in zip(layout.pack(b"".join(blocks)), round_keys[0])]
+    for rnd in range(1, 11):
+        # Slices are stored LSB first while the circuit numbers bits MSB first.
+        s0, s1, s2, s3, s4, s5, s6, s7 = state
+        out = _bitsliced_sbox(s7, s6, s5, s4, s3, s2, s1, s0, ones)[::-1]
+        state = [_permute_lanes(value, shift_rows) for value in out]
+        if rnd < 10:
+            # b_r = 2(a_r ^ a_r+1) ^ a_r+1 ^ a_r+2 ^ a_r+3, and a_r+2 ^ a_r+3 = rot2(a ^ rot1(a)).
+            rot = [_permute_lanes(value, rotate1) for value in state]
+            t = [a ^ b for a, b in zip(state, rot)]
+            rot2 = [_permute_lanes(value, rotate2) for value in t]
+            high = t[7]
+            doubled = [high, t[0] ^ high, t[1], t[2] ^ high, t[3] ^ high, t[4], t[5], t[6]]
+            state = [a ^ b ^ c for a, b, c in zip(doubled, rot, rot2)]
+        state = [value ^ key for value, key in zip(state, round_keys[rnd])]
+    data = layout.unpack(state)
+    return [data[i:i + 16] for i in range(0, len(data), 16)]
+
+
+# Without NumPy, batches this large go through the bitsliced engine instead of
+# the per-block T-table loop (see ``bench.py bitsliced`` for the crossover).
+BITSLICED_BATCH_THRESHOLD = 128
+
+
+class AesBackend:
+    """One AES-128 implementation, selectable by name through `AES_BACKENDS`.
+
+    Subclasses implement `encrypt_block`.  Backends that handle a whole batch
+    faster than a per-block loop override `encrypt_blocks` and set
+    ``batch_native``; ``auto_select`` marks the ones startup selection may
+    pick as the default for single-block work.
+    """
+    name = ""
+    batch_native = False
+    auto_select = False
+
+    def available(self) -> bool:
+        """Whether this host can run the backend (optional imports, shared libraries)."""
+        return True
+
+    def encrypt_block(self, schedule: KeySchedule, block: bytes) -> bytes:
+        """Encrypt one 16-byte block."""
+        raise NotImplementedError
+
+    def encrypt_blocks(self, schedules: Sequence[KeySchedule], blocks: Sequence[bytes]
+                       ) -> List[bytes]:
+        """Encrypt ``blocks[i]`` under ``schedules[i]``; repeat one schedule to share a key."""
+        if len(schedules) != len(blocks):
+            raise ValueError("Need exactly one key schedule per block")
+        encrypt = self.encrypt_block
+        return [encrypt(schedule, block) for schedule, block in zip(schedules, blocks)]
+
+    def encrypt_mac(self, schedule: KeySchedule, seed: bytes) -> bytes:
+        """5-byte MAC: the truncated encryption of ``MAC_BLOCK_PREFIX + seed``."""
+        return self.encrypt_block(schedule, MAC_BLOCK_PREFIX + bytes(seed))[:5]
+
+    def encrypt_macs(self, schedules: Sequence[KeySchedule], seeds: Sequence[bytes]
+                     ) -> List[bytes]:
+        """`encrypt_mac` for many seeds, one schedule per seed."""
+        blocks = [MAC_BLOCK_PREFIX + bytes(seed) for seed in seeds]
+        return [block[:5] for block in self.encrypt_blocks(schedules, blocks)]
+
+    def __repr__(self) -> str:
+        return f"<{type(self).__name__} {self.name!r}>"
+
+
+class ReferenceBackend(AesBackend):
+    """The explicit round-by-round implementation; re-expands the key on purpose."""
+    name = "reference"
+
+    def encrypt_block(self, schedule: KeySchedule, block: bytes) -> bytes:
+        return aes_encrypt_block_reference(schedule.key, block)
+
+
+class TTableBackend(AesBackend):
+    """Pure-Python T-table engine over cached key schedules."""
+    name = "ttable"
+    auto_select = True
+
+    def encrypt_block(self, schedule: KeySchedule, block: bytes) -> bytes:
+        if len(block) != 16:
+            raise ValueError("AES block must be 16 bytes")
+        functions = _hot_key_functions(schedule)
+        if functions is not None:
+            return functions[0](block)
+        return encrypt_words_ttable(schedule.words, block)
+
+    def encrypt_mac(self, schedule: KeySchedule, seed: bytes) -> bytes:
+        if len(seed) != 5:
+            raise ValueError("Seed must be exactly 5 bytes")
+        functions = _hot_key_functions(schedule)
+        if functions is not None:
+            return functions[1](seed)
+        return encrypt_mac_ttable(schedule, seed)
+
+    def encrypt_macs(self, schedules: Sequence[KeySchedule], seeds: Sequence[bytes]
+                     ) -> List[bytes]:
+        if len(schedules) != len(seeds):
+            raise ValueError("Need exactly one key schedule per block")
+        encrypt_mac = self.encrypt_mac
+        return [encrypt_mac(schedule, seed) for schedule, seed in zip(schedules, seeds)]
+
+
+class NumpyBackend(AesBackend):
+    """Vectorized NumPy engine; only worthwhile for batches."""
+    name = "numpy"
+    batch_native = True
+
+    def available(self) -> bool:
+        return load_numpy() is not None
+
+    def encrypt_block(self, schedule: KeySchedule, block: bytes) -> bytes:
+        return self.encrypt_blocks([schedule], [block])[0]
+
+    def encrypt_blocks(self, schedules: Sequence[KeySchedule], blocks: Sequence[bytes]
+                       ) -> List[bytes]:
+        numpy = _require_numpy()
+        if len(schedules) != len(blocks):
+            raise ValueError("Need exactly one key schedule per block")
+        if not blocks:
+            return []
+        if any(len(block) != 16 for block in blocks):
+            raise ValueError("AES block must be 16 bytes")
+        distinct, index = _index_schedules(schedules)
+        keys = numpy.frombuffer(b"".join(schedule.round_key_bytes() for schedule in distinct),
+                                dtype=numpy.uint8).reshape(-1, 176)
+        keys = keys[0] if len(distinct) == 1 else keys[index]
+        state = numpy.frombuffer(b"".join(blocks), dtype=numpy.uint8).reshape(-1, 16)
+        out = aes_encrypt_blocks_numpy(keys, state).tobytes()
+        return [out[i:i + 16] for i in range(0, len(out), 16)]
+
+
+class BitslicedBackend(AesBackend):
+    """Big-integer bitsliced engine; only worthwhile for batches."""
+    name = "bitsliced"
+    batch_native = True
+
+    def encrypt_block(self, schedule: KeySchedule, block: bytes) -> bytes:
+        return aes_encrypt_blocks_bitsliced([schedule], [block])[0]
+
+    def encrypt_blocks(self, schedules: Sequence[KeySchedule], blocks: Sequence[bytes]
+                       ) -> List[bytes]:
+        return aes_encrypt_blocks_bitsliced(schedules, blocks)
+
+
+def _schedule_runs(schedules: Sequence[KeySchedule], blocks: Sequence[bytes]
+                   ) -> Iterable[tuple[KeySchedule, bytes]]:
+    """Yield (schedule, joined blocks) for each run of consecutive blocks sharing a key."""
+    if len(schedules) != len(blocks):
+        raise ValueError("Need exactly one key schedule per block")
+    if any(len(block) != 16 for block in blocks):
+        raise ValueError("AES block must be 16 bytes")
+    start, count = 0, len(blocks)
+    while start < count:
+        schedule, end = schedules[start], start + 1
+        while end < count and schedules[end] is schedule:
+            end += 1
+        yield schedule, b"".join(blocks[start:end])
+        start = end
+
+
+class _CipherContext:
+    """One libcrypto EVP context, the key it holds, and reusable output buffers."""
+    __slots__ = ("free", "handle", "key", "out", "written", "written_ref")
+
+    def __init__(self, new: Callable[[], int], free: Callable[[int], None]) -> None:
+        import ctypes
+
+        self.free = free
+        self.handle = new()
+        self.key: bytes | None = None
+        self.out = ctypes.create_string_buffer(16)
+        self.written = ctypes.c_int()
+        self.written_ref = ctypes.byref(self.written)
+
+    def __del__(self) -> None:
+        if self.handle:
+            self.free(self.handle)
+
+
+class OpenSSLBackend(AesBackend):
+    """AES-128-ECB from the system libcrypto, loaded lazily through ctypes.
+
+    Each thread keeps one EVP context and only re-keys it when the schedule
+    changes, so runs of blocks under one key cost a single native call.
+    """
+    name = "openssl"
+    batch_native = True
+    auto_select = True
+    LIBRARY_NAMES = ("crypto", "libcrypto-3-x64", "libcrypto-3", "libcrypto-1_1-x64",
+                     "libcrypto-1_1", "libeay32")
+
+    def __init__(self) -> None:
+        self._lib = None
+        self._cipher = None
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _load(self):  # -> ctypes.CDLL | None
+        with self._lock:
+            if not self._loaded:
+                self._loaded = True
+                try:
+                    self._lib, self._cipher = self._open_library()
+                except (OSError, AttributeError):
+                    self._lib = None
+        return self._lib
+
+    def _open_library(self):  # -> tuple[ctypes.CDLL, int] | tuple[None, None]
+        import ctypes
+        import ctypes.util
+
+        for candidate in self.LIBRARY_NAMES:
+            path = ctypes.util.find_library(candidate)
+            if not path:
+                continue
+            lib = ctypes.CDLL(path)
+            lib.EVP_CIPHER_CTX_new.restype = ctypes.c_void_p
+            lib.EVP_CIPHER_CTX_new.argtypes = []
+            lib.EVP_CIPHER_CTX_free.argtypes = [ctypes.c_void_p]
+            lib.EVP_aes_128_ecb.restype = ctypes.c_void_p
+            lib.EVP_aes_128_ecb.argtypes = []
+            lib.EVP_EncryptInit_ex.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_void_p,
+                                               ctypes.c_char_p, ctypes.c_char_p]
+            lib.EVP_CIPHER_CTX_set_padding.argtypes = [ctypes.c_void_p, ctypes.c_int]
+            lib.EVP_EncryptUpdate.argtypes = [ctypes.c_void_p, ctypes.c_char_p,
+                                              ctypes.POINTER(ctypes.c_int), ctypes.c_char_p,
+                                              ctypes.c_int]
+            return lib, lib.EVP_aes_128_ecb()
+        return None, None
+
+    def available(self) -> bool:
+        return self._load() is not None
+
+    def _encrypt(self, key: bytes, data: bytes) -> bytes:
+        lib = self._lib if self._loaded else self._load()
+        if lib is None:
+            raise ValueError("libcrypto could not be loaded on this host")
+        context = getattr(self._local, "context", None)
+        if context is None:
+            context = self._local.context = _CipherContext(lib.EVP_CIPHER_CTX_new,
+                                                            lib.EVP_CIPHER_CTX_free)
+        if context.key != key:
+            if lib.EVP_EncryptInit_ex(context.handle, self._cipher, None, key, None) != 1:
+                raise ValueError("libcrypto rejected the AES key")
+            lib.EVP_CIPHER_CTX_set_padding(context.handle, 0)
+            context.key = key
+        size = len(data)
+        if len(context.out) < size:
+            import ctypes
+
+            context.out = ctypes.create_string_buffer(size)
+        if (lib.EVP_EncryptUpdate(context.handle, context.out, context.written_ref, data, size)
+                != 1 or context.written.value != size):
+            context.key = None
+            raise ValueError("libcrypto AES encryption failed")
+        return context.out.raw[:size]
+
+    def encrypt_block(self, schedule: KeySchedule, block: bytes) -> bytes:
+        if len(block) != 16:
+            raise ValueError("AES block must be 16 bytes")
+        return self._encrypt(schedule.key, bytes(block))
+
+    def encrypt_blocks(self, schedules: Sequence[KeySchedule], blocks: Sequence[bytes]
+                       ) -> List[bytes]:
+        out: List[bytes] = []
+        for schedule, data in _schedule_runs(schedules, blocks):
+            encrypted = self._encrypt(schedule.key, data)
+            out.extend(encrypted[i:i + 16] for i in range(0, len(encrypted), 16))
+        return out
+
+
+class CryptographyBackend(AesBackend):
+    """AES-128-ECB through the optional ``cryptography`` package."""
+    name = "cryptography"
+    batch_native = True
+    auto_select = True
+
+    def __init__(self) -> None:
+        self._local = threading.local()
+
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def _modules():  # -> tuple | None
+        try:
+            from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+        except ImportError:
+            return None
+        return Cipher, algorithms, modes
+
+    def available(self) -> bool:
+        return self._modules() is not None
+
+    def _encrypt(self, key: bytes, data: bytes) -> bytes:
+        modules = self._modules()
+        if modules is None:
+            raise ValueError("The cryptography package is not installed")
+        local = self._local
+        if getattr(local, "key", None) != key:
+            cipher, algorithms, modes = modules
+            # ECB carries no state between updates, so one encryptor serves every call.
+            local.encryptor = cipher(algorithms.AES(key), modes.ECB()).encryptor()
+            local.key = key
+        return local.encryptor.update(data)
+
+    def encrypt_block(self, schedule: KeySchedule, block: bytes) -> bytes:
+        if len(block) != 16:
+            raise ValueError("AES block must be 16 bytes")
+        return self._encrypt(schedule.key, bytes(block))
+
+    def encrypt_blocks(self, schedules: Sequence[KeySchedule], blocks: Sequence[bytes]
+                       ) -> List[bytes]:
+        out: List[bytes] = []
+        for schedule, data in _schedule_runs(schedules, blocks):
+            encrypted = self._encrypt(schedule.key, data)
+            out.extend(encrypted[i:i + 16] for i in range(0, len(encrypted), 16))
+        return out
+
+
+AES_BACKENDS: Dict[str, AesBackend] = {}
+
+
+def register_aes_backend(backend: AesBackend) -> AesBackend:
+    """Add `backend` to `AES_BACKENDS` under its name (replacing any previous one)."""
+    AES_BACKENDS[backend.name] = backend
+    return backend
+
+
+for _backend in (ReferenceBackend(), TTableBackend(), NumpyBackend(), BitslicedBackend(),
+                 OpenSSLBackend(), CryptographyBackend()):
+    register_aes_backend(_backend)
+
+AES_BACKEND_ENV = "KEYLIB_AES_BACKEND"
+
+# (key, plaintext, ciphertext): FIPS-197 appendix C.1 and SP 800-38A F.1.1.
+AES_KNOWN_ANSWERS = [
+    (bytes.fromhex("000102030405060708090a0b0c0d0e0f"),
+     bytes.fromhex("00112233445566778899aabbccddeeff"),
+     bytes.fromhex("69c4e0d86a7b0430d8cdb78070b4c55a")),
+    (bytes.fromhex("2b7e151628aed2a6abf7158809cf4f3c"),
+     bytes.fromhex("6bc1bee22e409f96e93d7e117393172a"),
+     bytes.fromhex("3ad77bb40d7a3660a89ecaf32466ef97")),
+]
+
+
+def check_aes_backend(backend: AesBackend) -> str | None:
+    """Run the known-answer vectors through both entry points; return a failure reason."""
+    if not backend.available():
+        return "not available on this host"
+    schedules = [KeySchedule(key) for key, _, _ in AES_KNOWN_ANSWERS]
+    plaintexts = [plaintext for _, plaintext, _ in AES_KNOWN_ANSWERS]
+    expected = [ciphertext for _, _, ciphertext in AES_KNOWN_ANSWERS]
+    try:
+        singles = [backend.encrypt_block(schedule, plaintext)
+                   for schedule, plaintext in zip(schedules, plaintexts)]
+        batch = backend.encrypt_blocks(schedules, plaintexts)
+    except (ValueError, OSError) as exc:
+        return f"raised {exc}"
+    if singles != expected or batch != expected:
+        return "known-answer mismatch"
+    return None
+
+
+def benchmark_aes_backend(backend: AesBackend, calls: int = 32) -> float:
+    """Time `calls` single-block encryptions; return microseconds per block."""
+    schedule = KeySchedule(AES_KNOWN_ANSWERS[0][0])
+    block = MAC_BLOCK_PREFIX + bytes(5)
+    encrypt = backend.encrypt_block
+    encrypt(schedule, block)
+    start = time.perf_counter()
+    for _ in range(calls):
+        encrypt(schedule, block)
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+class BackendSelection(namedtuple("BackendSelection", "name source timings rejected")):
+    """Which backend serves ``engine=None`` and why.
+
+    ``source`` is ``"env"`` or ``"benchmark"``; ``timings`` maps each passing
+    backend to microseconds per MAC and ``rejected`` maps failures to reasons.
+    """
+    __slots__ = ()
+
+    def describe(self) -> str:
+        """One-line summary for verbose output."""
+        if self.source == "env":
+            return f"{self.name} (from {AES_BACKEND_ENV})"
+        timings = ", ".join(f"{name} {value:.1f}us" for name, value in sorted(
+            self.timings.items(), key=lambda item: item[1]))
+        return f"{self.name} (fastest correct: {timings})"
+
+
+_SELECTION: BackendSelection | None = None
+_SELECTION_LOCK = threading.Lock()
+
+
+def select_aes_backend(refresh: bool = False) -> BackendSelection:
+    """Choose the default backend once per process.
+
+    `AES_BACKEND_ENV` names a backend explicitly; otherwise every
+    ``auto_select`` backend that is available and passes `check_aes_backend`
+    is timed with `benchmark_aes_backend` and the fastest one wins.
+    """
+    global _SELECTION
+    with _SELECTION_LOCK:
+        if _SELECTION is not None and not refresh:
+            return _SELECTION
+        requested = os.environ.get(AES_BACKEND_ENV, "").strip().lower()
+        if requested and requested != "auto":
+            backend = AES_BACKENDS.get(requested)
+            if backend is None:
+                raise ValueError(f"Unknown AES backend {requested!r} in {AES_BACKEND_ENV}")
+            failure = check_aes_backend(backend)
+            if failure:
+                raise ValueError(f"AES backend {requested!r} from {AES_BACKEND_ENV} {failure}")
+            _SELECTION = BackendSelection(requested, "env", {}, {})
+            return _SELECTION
+        timings: Dict[str, float] = {}
+        rejected: Dict[str, str] = {}
+        for name, backend in AES_BACKENDS.items():
+            if not backend.auto_select:
+                continue
+            failure = check_aes_backend(backend)
+            if failure:
+                rejected[name] = failure
+            else:
+                timings[name] = benchmark_aes_backend(backend)
+        # The T-table engine has no dependencies, so it always survives the checks.
+        best = min(timings, key=timings.__getitem__)
+        _SELECTION = BackendSelection(best, "benchmark", timings, rejected)
+        return _SELECTION
+
+
+def default_aes_backend() -> AesBackend:
+    """The backend used when no engine is named."""
+    return AES_BACKENDS[select_aes_backend().name]
+
+
+def _resolve_engine(engine: str | None) -> AesBackend:
+    if engine is None:
+        return default_aes_backend()
+    backend = AES_BACKENDS.get(engine)
+    if backend is None:
+        raise ValueError(f"Unknown AES engine {engine!r}")
+    if not backend.available():
+        raise ValueError(f"AES engine {engine!r} is not available on this host")
+    return backend
+
+
+# One block does not repay `select_aes_backend`: probing the native libraries
+# (``find_library`` runs ldconfig) and timing every backend costs far more
+# than the encryption.  Single-block entry points therefore default to the
+# dependency-free T-table engine; batch paths keep the selection.
+SINGLE_SHOT_BACKEND = "ttable"
+
+
+def single_shot_backend(engine: str | None = None) -> AesBackend:
+    """Backend for one-block work: `engine`, else the one `AES_BACKEND_ENV`
+    names (``auto`` runs `select_aes_backend`), else `SINGLE_SHOT_BACKEND`."""
+    if engine is None and not os.environ.get(AES_BACKEND_ENV, "").strip():
+        return AES_BACKENDS[SINGLE_SHOT_BACKEND]
+    return _resolve_engine(engine)
+
+
+def aes_encrypt_block(key: bytes, block: bytes, engine: str | None = None) -> bytes:
+    """Encrypt a single 16-byte block with AES-128 (no padding).
+
+    ``engine`` names an entry of `AES_BACKENDS`; ``None`` uses
+    `single_shot_backend`.  Every backend must produce identical output, so
+    the explicit ``"reference"`` engine stays available for audits and
+    comparisons.
+    """
+    return single_shot_backend(engine).encrypt_block(get_key_schedule(key), block)
+
+
+def aes_encrypt_blocks(schedule: KeySchedule | bytes, blocks: Iterable[bytes],
+                       engine: str | None = None) -> List[bytes]:
+    """Encrypt many 16-byte blocks under one key, expanding the key only once."""
+    if not isinstance(schedule, KeySchedule):
+        schedule = get_key_schedule(schedule)
+    blocks = list(blocks)
+    return _resolve_engine(engine).encrypt_blocks([schedule] * len(blocks), blocks)
+
+
+def hash_forward(digest: bytes, iterations: int) -> bytes:
     """Repeat SHA-256 hashing `iterations` times, returning the final digest."""
-    digest = secret
+    sha256 = hashlib.sha256
     for _ in range(iterations):
-        digest = hashlib.sha256(digest).digest()
+        digest = sha256(digest).digest()
     return digest
 
 
-def derive_key_from_blob(blob: str, seed: bytes, algo: int) -> tuple[bytes, int, bytes]:
+# SHA-256 initial hash value and round constants (FIPS 180-4, section 5.3.3
+# and 4.2.2), used by the multi-lane NumPy kernel below.
+SHA256_H0 = [
+    0x6a09e667, 0xbb67ae85, 0x3c6ef372, 0xa54ff53a, 0x510e527f, 0x9b05688c, 0x1f83d9ab, 0x5be0cd19,
+]
+SHA256_K = [
+    0x428a2f98, 0x71374491, 0xb5c0fbcf, 0xe9b5dba5, 0x3956c25b, 0x59f111f1, 0x923f82a4, 0xab1c5ed5,
+    0xd807aa98, 0x12835b01, 0x243185be, 0x550c7dc3, 0x72be5d74, 0x80deb1fe, 0x9bdc06a7, 0xc19bf174,
+    0xe49b69c1, 0xefbe4786, 0x0fc19dc6, 0x240ca1cc, 0x2de92c6f, 0x4a7484aa, 0x5cb0a9dc, 0x76f988da,
+    0x983e5152, 0xa831c66d, 0xb00327c8, 0xbf597fc7, 0xc6e00bf3, 0xd5a79147, 0x06ca6351, 0x14292967,
+    0x27b70a85, 0x2e1b2138, 0x4d2c6dfc, 0x53380d13, 0x650a7354, 0x766a0abb, 0x81c2c92e, 0x92722c85,
+    0xa2bfe8a1, 0xa81a664b, 0xc24b8b70, 0xc76c51a3, 0xd192e819, 0xd6990624, 0xf40e3585, 0x106aa070,
+    0x19a4c116, 0x1e376c08, 0x2748774c, 0x34b0bcb5, 0x391c0cb3, 0x4ed8aa4a, 0x5b9cca4f, 0x682e6ff3,
+    0x748f82ee, 0x78a5636f, 0x84c87814, 0x8cc70208, 0x90befffa, 0xa4506ceb, 0xbef9a3f7, 0xc67178f2,
+]
+
+
+@functools.lru_cache(maxsize=None)
+def _sha256_tables():  # -> tuple of numpy arrays
+    numpy = _require_numpy("The numpy SHA-256 engine")
+    return (numpy.array(SHA256_H0, dtype=numpy.uint32),
+            numpy.array(SHA256_K, dtype=numpy.uint32))
+
+
+def sha256_lanes_numpy(states):
+    """Hash every row of an (N, 8) uint32 array as a 32-byte message.
+
+    Each row holds one digest as big-endian words, so the output (same shape)
+    is the next link of N independent hash chains.  A 32-byte message always
+    fits one padded block, which pins message words 8..15 to constants; the
+    64 rounds then run column-wise across all lanes at once.
+    """
+    numpy = _require_numpy("The numpy SHA-256 engine")
+    h0, k = _sha256_tables()
+    lanes = states.shape[0]
+    u32 = numpy.uint32
+
+    def rotr(x, n):
+        return (x >> u32(n)) | (x << u32(32 - n))
+
+    columns = numpy.ascontiguousarray(states.T)
+    zero = numpy.zeros(lanes, dtype=u32)
+    w = [columns[i] for i in range(8)]
+    w += [numpy.full(lanes, 0x80000000, dtype=u32)] + [zero] * 6
+    w.append(numpy.full(lanes, 256, dtype=u32))
+    for t in range(16, 64):
+        x, y = w[t - 15], w[t - 2]
+        s0 = rotr(x, 7) ^ rotr(x, 18) ^ (x >> u32(3))
+        s1 = rotr(y, 17) ^ rotr(y, 19) ^ (y >> u32(10))
+        w.append(w[t - 16] + s0 + w[t - 7] + s1)
+    a, b, c, d, e, f, g, h = (numpy.full(lanes, value, dtype=u32) for value in h0)
+    for t in range(64):
+        t1 = h + (rotr(e, 6) ^ rotr(e, 11) ^ rotr(e, 25)) + ((e & f) ^ (~e & g)) + k[t] + w[t]
+        t2 = (rotr(a, 2) ^ rotr(a, 13) ^ rotr(a, 22)) + ((a & b) ^ (a & c) ^ (b & c))
+        h, g, f, e, d, c, b, a = g, f, e, d + t1, c, b, a, t1 + t2
+    return (numpy.stack((a, b, c, d, e, f, g, h), axis=1) + h0).astype(u32)
+
+
+def hash_chains_numpy(secrets: Sequence[bytes], iterations: int) -> List[List[bytes]]:
+    """Run every 32-byte secret `iterations` steps down its chain in lockstep.
+
+    Returns one list per secret holding rungs 1..iterations.  All lanes
+    advance together, one `sha256_lanes_numpy` call per step.
+    """
+    numpy = _require_numpy("The numpy SHA-256 engine")
+    if any(len(secret) != 32 for secret in secrets):
+        raise ValueError("The numpy SHA-256 engine only hashes 32-byte chain links")
+    chains: List[List[bytes]] = [[] for _ in secrets]
+    if not secrets or iterations <= 0:
+        return chains
+    states = numpy.frombuffer(b"".join(secrets), dtype=">u4").astype(numpy.uint32)
+    states = states.reshape(len(secrets), 8)
+    for _ in range(iterations):
+        states = sha256_lanes_numpy(states)
+        packed = states.astype(">u4").tobytes()
+        for lane, chain in enumerate(chains):
+            chain.append(packed[32 * lane:32 * lane + 32])
+    return chains
+
+
+HASH_CHAIN_ENGINES = ("hashlib", "numpy")
+
+
+class HashChainLadder:
+    """Lazily filled SHA-256 chain for one secret.
+
+    Rung ``n`` is the secret hashed ``n`` times.  With the default
+    ``checkpoint_interval`` of 1 every rung is kept, so a lookup below the
+    current height is a list index.  Larger intervals keep only every k-th
+    rung and hash forward from the nearest checkpoint below the target,
+    trading up to ``k - 1`` hashes per lookup for a k-fold smaller ladder.
+    """
+    __slots__ = ("checkpoint_interval", "_rungs", "_lock")
+
+    def __init__(self, secret: bytes, checkpoint_interval: int = 1) -> None:
+        if checkpoint_interval < 1:
+            raise ValueError("Checkpoint interval must be at least 1")
+        self.checkpoint_interval = checkpoint_interval
+        self._rungs: List[bytes] = [bytes(secret)]
+        self._lock = threading.Lock()
+
+    @property
+    def height(self) -> int:
+        """Highest iteration count stored as a checkpoint so far."""
+        return (len(self._rungs) - 1) * self.checkpoint_interval
+
+    def digest(self, iterations: int) -> bytes:
+        """Return the secret hashed `iterations` times, extending the ladder on a miss."""
+        if iterations < 0:
+            raise ValueError("Iteration count cannot be negative")
+        index, remainder = divmod(iterations, self.checkpoint_interval)
+        rungs = self._rungs
+        if index >= len(rungs):
+            with self._lock:
+                digest = rungs[-1]
+                while len(rungs) <= index:
+                    digest = hash_forward(digest, self.checkpoint_interval)
+                    rungs.append(digest)
+        return hash_forward(rungs[index], remainder)
+
+    def extend(self, chain: Sequence[bytes]) -> None:
+        """Store precomputed rungs; ``chain[i]`` must be the secret hashed ``i + 1`` times."""
+        interval = self.checkpoint_interval
+        with self._lock:
+            rungs = self._rungs
+            while len(rungs) * interval <= len(chain):
+                rungs.append(chain[len(rungs) * interval - 1])
+
+    def __len__(self) -> int:
+        return len(self._rungs)
+
+
+class HashChainCache:
+    """Bounded LRU of `HashChainLadder` objects keyed by secret."""
+
+    def __init__(self, max_ladders: int = 1024, checkpoint_interval: int = 1) -> None:
+        if max_ladders < 1:
+            raise ValueError("Hash chain cache needs room for at least one ladder")
+        if checkpoint_interval < 1:
+            raise ValueError("Checkpoint interval must be at least 1")
+        self.max_ladders = max_ladders
+        self.checkpoint_interval = checkpoint_interval
+        self.hits = 0
+        self.misses = 0
+        self._ladders: OrderedDict[bytes, HashChainLadder] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def configure(self, max_ladders: int | None = None,
+                  checkpoint_interval: int | None = None) -> None:
+        """Change the size bound or checkpoint spacing; existing ladders are dropped."""
+        if max_ladders is not None and max_ladders < 1:
+            raise ValueError("Hash chain cache needs room for at least one ladder")
+        if checkpoint_interval is not None and checkpoint_interval < 1:
+            raise ValueError("Checkpoint interval must be at least 1")
+        with self._lock:
+            if max_ladders is not None:
+                self.max_ladders = max_ladders
+            if checkpoint_interval is not None:
+                self.checkpoint_interval = checkpoint_interval
+            self._ladders.clear()
+
+    def ladder(self, secret: bytes) -> HashChainLadder:
+        """Return the ladder for `secret`, creating an empty one on first use."""
+        secret = bytes(secret)
+        with self._lock:
+            ladder = self._ladders.get(secret)
+            if ladder is not None:
+                self._ladders.move_to_end(secret)
+                self.hits += 1
+                return ladder
+            self.misses += 1
+            ladder = HashChainLadder(secret, self.checkpoint_interval)
+            self._ladders[secret] = ladder
+            while len(self._ladders) > self.max_ladders:
+                self._ladders.popitem(last=False)
+            return ladder
+
+    def digest(self, secret: bytes, iterations: int) -> bytes:
+        """Return `secret` hashed `iterations` times using the cached ladder."""
+        return self.ladder(secret).digest(iterations)
+
+    def precompute(self, targets: Mapping[bytes, int], engine: str | None = None) -> int:
+        """Fill each secret's ladder up to its target height in one pass.
+
+        ``engine`` is ``"hashlib"`` (the default) or ``"numpy"``, which
+        advances all chains together through `hash_chains_numpy`.  Returns the
+        number of SHA-256 evaluations performed.
+        """
+        engine = engine or "hashlib"
+        if engine not in HASH_CHAIN_ENGINES:
+            raise ValueError(f"Unknown hash chain engine {engine!r}")
+        # Only whole checkpoints are stored; hashing past the last one below
+        # a target is left to the lookup, as with a lazily grown ladder.
+        interval = self.checkpoint_interval
+        pending: Dict[bytes, int] = {}
+        for secret, height in targets.items():
+            top = height - height % interval
+            if self.ladder(secret).height < top:
+                pending[bytes(secret)] = top
+        if not pending:
+            return 0
+        if engine == "numpy":
+            height = max(pending.values())
+            chains = hash_chains_numpy(list(pending), height)
+            for secret, chain in zip(pending, chains):
+                self.ladder(secret).extend(chain[:pending[secret]])
+            return height * len(pending)
+        hashes = 0
+        for secret, top in pending.items():
+            ladder = self.ladder(secret)
+            hashes += top - ladder.height
+            ladder.digest(top)
+        return hashes
+
+    def discard(self, secret: bytes) -> HashChainLadder | None:
+        """Remove and return the ladder for `secret`, if one is cached."""
+        with self._lock:
+            return self._ladders.pop(bytes(secret), None)
+
+    def clear(self) -> None:
+        """Drop every ladder and reset the counters."""
+        with self._lock:
+            self._ladders.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Snapshot of ladder count, stored rungs, and hit/miss counters."""
+        with self._lock:
+            return {"ladders": len(self._ladders), "max_ladders": self.max_ladders,
+                    "checkpoint_interval": self.checkpoint_interval,
+                    "rungs": sum(len(ladder) for ladder in self._ladders.values()),
+                    "hits": self.hits, "misses": self.misses}
+
+
+HASH_CHAIN_CACHE = HashChainCache()
+
+
+def run_hash_chain(secret: bytes, iterations: int) -> bytes:
+    """Repeat SHA-256 hashing `iterations` times, served from the per-secret ladder cache."""
+    return HASH_CHAIN_CACHE.digest(secret, iterations)
+
+
+# AES keys handed out per secret by `_secret_key_schedule` (at most one per
+# iteration count), so `invalidate_secret` knows what to evict.
+_SECRET_KEYS: Dict[bytes, set] = {}
+
+
+def _secret_key_schedule(secret: bytes, iterations: int) -> KeySchedule:
+    """Schedule for `secret` hashed `iterations` times, recorded against the secret."""
+    aes_key = run_hash_chain(secret, iterations)[:16]
+    keys = _SECRET_KEYS.get(secret)
+    if keys is None:
+        keys = _SECRET_KEYS.setdefault(bytes(secret), set())
+    keys.add(aes_key)
+    return get_key_schedule(aes_key)
+
+
+def invalidate_secret(secret: bytes) -> int:
+    """Evict `secret`'s ladder and every key derived from it, from every cache tier.
+
+    Caches are keyed by content (the secret, and the AES keys hashed from
+    it), so stale entries are never served for a new blob; this frees their
+    memory once a blob is replaced.  The keys come from the record kept by
+    derivations, not by re-hashing the ladder.  Returns the number of cache
+    entries removed.
+    """
+    removed = int(HASH_CHAIN_CACHE.discard(secret) is not None)
+    keys = _SECRET_KEYS.pop(bytes(secret), ())
+    for key in keys:
+        removed += SCHEDULE_CACHE.discard(key)
+        removed += COMPILED_KEYS.discard(key)
+        removed += FUSED_TABLES.discard(key)
+    if keys:
+        removed += DERIVATION_CACHE.discard_keys(keys)
+    return removed
+
+
+def precompute_hash_chains(password_map: Mapping[int, str] | PasswordRegistry | None = None,
+                           engine: str | None = None) -> int:
+    """Fill `HASH_CHAIN_CACHE` with the full ladder of every valid algo in the map.
+
+    Each secret is hashed up to ``255 - min_seed`` times, the most any
+    accepted seed can need, so later derivations never extend a ladder.
+    Returns the number of SHA-256 evaluations performed.
+    """
+    registry = registry_for(password_map)
+    targets: Dict[bytes, int] = {}
+    for record in registry.records().values():
+        height = 255 - record.min_seed
+        targets[record.secret] = max(height, targets.get(record.secret, 0))
+    return HASH_CHAIN_CACHE.precompute(targets, engine)
+
+
+# Precomputed derivation table: for every (algo, seed tail) the AES key is
+# fixed, so a file can hold all 256 x 256 expanded schedules up front.
+#
+# Layout (little-endian header, then one fixed-size entry per algo * 256 + tail):
+#   header  magic, version, entry size, algo count, tail count, map fingerprint
+#   entry   status byte (1 = seed tail accepted), iterations byte, 2 pad bytes,
+#           176-byte round keys as big-endian words; the first 16 bytes are the
+#           AES key, i.e. the hash-chain digest prefix.
+DERIVATION_TABLE_MAGIC = b"GM5KTBL\0"
+DERIVATION_TABLE_VERSION = 1
+DERIVATION_TABLE_HEADER = struct.Struct("<8sHHHH32s16x")
+DERIVATION_TABLE_ENTRY = struct.Struct("<BB2x176s")
+DERIVATION_TABLE_ENV = "KEYLIB_DERIVATION_TABLE"
+
+
+def password_map_fingerprint(password_map: Mapping[int, str]) -> bytes:
+    """SHA-256 over the sorted (algo, blob) pairs, identifying one map's contents."""
+    digest = hashlib.sha256()
+    for algo in sorted(password_map):
+        digest.update(f"{algo}:{password_map[algo] or ''}\n".encode())
+    return digest.digest()
+
+
+def derivation_table_row(algo: int) -> bytes:
+    """Build the 256 table entries for `algo` against the built-in map."""
+    try:
+        record = DEFAULT_REGISTRY.record(algo)
+    except ValueError:
+        record = None
+    empty = DERIVATION_TABLE_ENTRY.pack(0, 0, bytes(176))
+    if record is None:
+        return empty * 256
+    entries = []
+    for tail in range(256):
+        seed = bytes(4) + bytes((tail,))
+        try:
+            iterations = iterations_for(record, algo, seed)
+        except ValueError:
+            iterations = None
+        if iterations is None:
+            entries.append(empty)
+            continue
+        aes_key = run_hash_chain(record.secret, iterations)[:16]
+        words = expand_key_words(aes_key)
+        entries.append(DERIVATION_TABLE_ENTRY.pack(1, iterations, struct.pack(">44I", *words)))
+    return b"".join(entries)
+
+
+def build_derivation_table(path: str, jobs: int | None = None) -> int:
+    """Write the derivation table for `PASSWORD_MAP` to `path`, returning its size.
+
+    Rows are built across ``jobs`` worker processes (default: one per CPU)
+    and written in algo order to a temporary file that replaces `path`
+    atomically, so readers never map a half-written table.  On Windows the
+    replace fails with PermissionError while any process has `path` mapped.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    header = DERIVATION_TABLE_HEADER.pack(
+        DERIVATION_TABLE_MAGIC, DERIVATION_TABLE_VERSION, DERIVATION_TABLE_ENTRY.size,
+        256, 256, password_map_fingerprint(PASSWORD_MAP))
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, "wb") as handle:
+            handle.write(header)
+            if jobs == 1:
+                handle.writelines(map(derivation_table_row, range(256)))
+            else:
+                with ProcessPoolExecutor(max_workers=jobs) as pool:
+                    handle.writelines(pool.map(derivation_table_row, range(256), chunksize=8))
+            size = handle.tell()
+        _replace_file(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return size
+
+
+class DerivationTable:
+    """Read-only memory map of a table written by `build_derivation_table`.
+
+    The mapping is shared through the page cache, so every process that
+    opens the same file pays for one copy.  `lookup` returns the iteration
+    count and key schedule for an accepted (algo, seed) pair, or None when
+    the table cannot answer and the normal derivation should run (and raise).
+    That includes algos whose `PASSWORD_MAP` blob changed after the table was
+    opened, since the header fingerprint only vouches for the map as it was.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._blobs: Dict[int, str] = {}
+        with open(path, "rb") as handle:
+            if os.fstat(handle.fileno()).st_size < DERIVATION_TABLE_HEADER.size:
+                raise ValueError(f"{path} is too short to be a derivation table")
+            self._map = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._check_header()
+        except ValueError:
+            self._map.close()
+            raise
+
+    def _check_header(self) -> None:
+        magic, version, entry_size, algos, tails, fingerprint = \
+            DERIVATION_TABLE_HEADER.unpack_from(self._map, 0)
+        if magic != DERIVATION_TABLE_MAGIC:
+            raise ValueError(f"{self.path} is not a derivation table")
+        if version != DERIVATION_TABLE_VERSION or entry_size != DERIVATION_TABLE_ENTRY.size:
+            raise ValueError(f"{self.path} has unsupported table version {version}")
+        expected = DERIVATION_TABLE_HEADER.size + algos * tails * entry_size
+        if algos != 256 or tails != 256 or len(self._map) != expected:
+            raise ValueError(f"{self.path} is truncated or has an unexpected shape")
+        blobs = dict(PASSWORD_MAP)
+        if fingerprint != password_map_fingerprint(blobs):
+            raise ValueError(f"{self.path} was built for a different password map; "
+                             "rerun `keygen.py precompute`")
+        self._blobs = blobs
+
+    def lookup(self, algo: int, seed: bytes) -> tuple[int, KeySchedule] | None:
+        """(iterations, schedule) for an accepted pair, or None to fall back."""
+        if not 0 <= algo < 256 or len(seed) != 5:
+            return None
+        # Usually the very same str object, so this costs an identity check.
+        if PASSWORD_MAP.get(algo) != self._blobs.get(algo):
+            return None
+        entry_size = DERIVATION_TABLE_ENTRY.size
+        offset = DERIVATION_TABLE_HEADER.size + ((algo << 8) | seed[4]) * entry_size
+        table = self._map
+        if not table[offset]:
+            return None
+        round_keys = table[offset + 4:offset + entry_size]
+        return table[offset + 1], SCHEDULE_CACHE.get(round_keys[:16], round_keys)
+
+    def close(self) -> None:
+        self._map.close()
+
+
+_DERIVATION_TABLE: DerivationTable | None = None
+_DERIVATION_TABLE_RESOLVED = False
+
+
+def derivation_table() -> DerivationTable | None:
+    """The table `derive_key_from_algo` consults, mapping `DERIVATION_TABLE_ENV` on first use.
+
+    A table that cannot be opened (missing, corrupt, or built for another
+    map) is reported once as a RuntimeWarning; derivations then run normally.
+    """
+    global _DERIVATION_TABLE, _DERIVATION_TABLE_RESOLVED
+    if not _DERIVATION_TABLE_RESOLVED:
+        _DERIVATION_TABLE_RESOLVED = True
+        path = os.environ.get(DERIVATION_TABLE_ENV, "").strip()
+        if path:
+            try:
+                _DERIVATION_TABLE = DerivationTable(path)
+            except (OSError, ValueError) as exc:
+                import warnings
+
+                warnings.warn(f"Ignoring {DERIVATION_TABLE_ENV}: {exc}", RuntimeWarning,
+                              stacklevel=2)
+    return _DERIVATION_TABLE
+
+
+def use_derivation_table(path: str | None) -> DerivationTable | None:
+    """Map the table at `path` for built-in map lookups, or stop using one with None."""
+    global _DERIVATION_TABLE, _DERIVATION_TABLE_RESOLVED
+    table = DerivationTable(path) if path else None
+    _DERIVATION_TABLE, _DERIVATION_TABLE_RESOLVED = table, True
+    return table
+
+
+class DerivationCache:
+    """Memory-budgeted LRU of derived keys shared by every namespace.
+
+    Keys are ``(namespace, algo, seed tail)``; values hold the iteration
+    count, the key schedule, and the blob they came from, so an entry is
+    ignored (and replaced) once its namespace maps the algo to a different
+    blob.  Each entry is charged `ENTRY_BYTES`, a measured upper bound for the
+    entry plus its schedule; least recently used entries go first when the
+    budget is exceeded.  A budget of 0 disables the cache.
+    """
+    ENTRY_BYTES = 1024
+
+    def __init__(self, budget_bytes: int = 32 << 20) -> None:
+        if budget_bytes < 0:
+            raise ValueError("Derivation cache budget cannot be negative")
+        self.budget_bytes = budget_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[tuple[str, int, int], tuple[str, int, KeySchedule]] = \
+            OrderedDict()
+        self._lock = threading.Lock()
+
+    def configure(self, budget_bytes: int) -> None:
+        """Change the budget, evicting down to it straight away."""
+        if budget_bytes < 0:
+            raise ValueError("Derivation cache budget cannot be negative")
+        with self._lock:
+            self.budget_bytes = budget_bytes
+            self._evict()
+
+    def _evict(self) -> None:
+        limit = self.budget_bytes // self.ENTRY_BYTES
+        while len(self._entries) > limit:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, namespace: str, algo: int, tail: int, blob: str
+            ) -> tuple[int, KeySchedule] | None:
+        """Cached (iterations, schedule) if it was derived from `blob`."""
+        key = (namespace, algo, tail)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry[0] is blob or entry[0] == blob):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1], entry[2]
+            self.misses += 1
+            return None
+
+    def put(self, namespace: str, algo: int, tail: int, blob: str, iterations: int,
+            schedule: KeySchedule) -> None:
+        with self._lock:
+            self._entries[namespace, algo, tail] = (blob, iterations, schedule)
+            self._entries.move_to_end((namespace, algo, tail))
+            self._evict()
+
+    def discard_keys(self, keys: Collection[bytes]) -> int:
+        """Drop every entry whose schedule is for one of `keys`; returns how many."""
+        with self._lock:
+            stale = [entry_key for entry_key, (_, _, schedule) in self._entries.items()
+                     if schedule.key in keys]
+            for entry_key in stale:
+                del self._entries[entry_key]
+            return len(stale)
+
+    def clear(self, namespace: str | None = None) -> None:
+        """Drop one namespace's entries, or everything (and the counters) with None."""
+        with self._lock:
+            if namespace is None:
+                self._entries.clear()
+                self.hits = self.misses = self.evictions = 0
+                return
+            for key in [key for key in self._entries if key[0] == namespace]:
+                del self._entries[key]
+
+    def stats(self) -> Dict[str, object]:
+        """Budget, estimated use, counters, and entry count per namespace."""
+        with self._lock:
+            per_namespace: Dict[str, int] = {}
+            for namespace, _, _ in self._entries:
+                per_namespace[namespace] = per_namespace.get(namespace, 0) + 1
+            return {"entries": len(self._entries), "budget_bytes": self.budget_bytes,
+                    "used_bytes": len(self._entries) * self.ENTRY_BYTES,
+                    "hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "namespaces": per_namespace}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+DERIVATION_CACHE = DerivationCache()
+
+
+def _derivation_key(registry: PasswordRegistry, algo: int, seed: bytes
+                    ) -> tuple[int, KeySchedule]:
+    """(iterations, schedule) for one request, from the mapped table when it covers it."""
+    if registry is DEFAULT_REGISTRY:
+        table = derivation_table()
+        if table is not None:
+            hit = table.lookup(algo, seed)
+            if hit is not None:
+                return hit
+    namespace = registry.namespace
+    blob = registry.password_map.get(algo) if namespace is not None and len(seed) == 5 else None
+    if namespace is not None and blob:
+        hit = DERIVATION_CACHE.get(namespace, algo, seed[4], blob)
+        if hit is not None:
+            return hit
+    record = registry.record(algo)
+    iterations = iterations_for(record, algo, seed)
+    schedule = _secret_key_schedule(record.secret, iterations)
+    if namespace is not None and blob:
+        DERIVATION_CACHE.put(namespace, algo, seed[4], blob, iterations, schedule)
+    return iterations, schedule
+
+
+def derive_key_from_blob(blob: str, seed: bytes, algo: int, engine: str | None = None
+                         ) -> tuple[bytes, int, bytes]:
     """Derive the 5-byte MAC from a specific blob and seed."""
-    record = parse_password_blob(blob)
+    return derive_key_from_record(parse_password_blob_cached(blob), seed, algo, engine)
+
+
+def iterations_for(record: PasswordRecord, algo: int, seed: bytes) -> int:
+    """Check `seed` against `record` and return the hash-chain iteration count."""
     if algo != record.algo_id:
         raise ValueError(f"Algorithm mismatch: blob expects {record.algo_id}, got {algo}")
     if len(seed) != 5:
         raise ValueError("Seed must be exactly 5 bytes")
-    seed_tail = seed[4]
-    max_seed = 255 - seed_tail
+    max_seed = 255 - seed[4]
     if record.min_seed > max_seed:
         raise ValueError("Seed is not allowed by the blob's min_seed constraint")
-    iterations = max_seed - record.min_seed
-    digest = run_hash_chain(record.secret, iterations)
-    aes_key = digest[:16]
-    block = bytearray([0xFF] * 16)
-    block[11:16] = seed
-    mac = aes_encrypt_block(aes_key, bytes(block))[:5]
-    return mac, iterations, aes_key
-
-
-def derive_key_from_algo(algo: int, seed: bytes, password_map: Mapping[int, str] | None = None
-                          ) -> tuple[bytes, int, bytes]:
-    """Look up the blob for `algo` and run the derivation pipeline."""
-    if password_map is None:
-        password_map = PASSWORD_MAP
-    blob = password_map.get(algo)
-    if not blob:
-        raise ValueError(f"No password blob registered for algorithm {algo}")
-    return derive_key_from_blob(blob, seed, algo)
+    return max_seed - record.min_seed
+
+
+def derive_key_from_record(record: PasswordRecord, seed: bytes, algo: int,
+                           engine: str | None = None) -> tuple[bytes, int, bytes]:
+    """Derive the 5-byte MAC from an already verified record and seed."""
+    iterations = iterations_for(record, algo, seed)
+    schedule = _secret_key_schedule(record.secret, iterations)
+    return single_shot_backend(engine).encrypt_mac(schedule, seed), iterations, schedule.key
+
+
+def derive_key_from_algo(algo: int, seed: bytes,
+                         password_map: Mapping[int, str] | PasswordRegistry | None = None,
+                         engine: str | None = None, namespace: str | None = None
+                         ) -> tuple[bytes, int, bytes]:
+    """Look up the record for `algo` and run the derivation pipeline.
+
+    The blob comes from ``password_map`` or the map registered as
+    ``namespace`` (see `register_namespace`); with neither, the built-in map.
+    ``engine=None`` uses `single_shot_backend`.
+    """
+    iterations, schedule = _derivation_key(resolve_registry(password_map, namespace), algo, seed)
+    return single_shot_backend(engine).encrypt_mac(schedule, seed), iterations, schedule.key
+
+
+class DerivationResult(namedtuple("DerivationResult",
+                                  "algo seed mac iterations aes_key error engine",
+                                  defaults=(None, None, None, None, None))):
+    """Outcome of one batch request: either `mac` and friends, or `error`.
+
+    ``engine`` names the `AES_BACKENDS` entry that encrypted the MAC.
+    """
+    __slots__ = ()
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def _batch_backend(engine: str | None, total: int) -> AesBackend:
+    """Backend for `total` blocks: `engine`, or a vectorized one once the batch is big enough."""
+    backend = _resolve_engine(engine)
+    if engine is None and not backend.batch_native:
+        if total >= NUMPY_BATCH_THRESHOLD and load_numpy() is not None:
+            return AES_BACKENDS["numpy"]
+        if total >= BITSLICED_BATCH_THRESHOLD:
+            return AES_BACKENDS["bitsliced"]
+    return backend
+
+
+def derive_keys_batch(pairs: Iterable[tuple[int, bytes]],
+                      password_map: Mapping[int, str] | PasswordRegistry | None = None,
+                      engine: str | None = None, namespace: str | None = None
+                      ) -> List[DerivationResult]:
+    """Derive keys for many (algo, seed) pairs, returning results in input order.
+
+    Duplicate pairs are derived once.  Seeds that share an algo and tail byte
+    share one record lookup, one hash-chain digest, and one key schedule.
+    Validation failures become per-item `DerivationResult.error` strings
+    (the same messages `derive_key_from_algo` raises) instead of aborting.
+    With ``engine=None`` and a default backend that is not batch-native,
+    batches of at least `NUMPY_BATCH_THRESHOLD` blocks are encrypted in one
+    vectorized NumPy call when NumPy is importable, and batches of at least
+    `BITSLICED_BATCH_THRESHOLD` use the bitsliced engine when it is not.
+    ``password_map`` and ``namespace`` select the map as in `derive_key_from_algo`.
+    """
+    registry = resolve_registry(password_map, namespace)
+    requests = [(algo, bytes(seed)) for algo, seed in pairs]
+    groups: Dict[tuple[int, int], List[bytes]] = {}
+    for algo, seed in dict.fromkeys(requests):
+        tail = seed[4] if len(seed) == 5 else -1
+        groups.setdefault((algo, tail), []).append(seed)
+
+    results: Dict[tuple[int, bytes], DerivationResult] = {}
+    jobs: List[tuple[int, int, KeySchedule, List[bytes]]] = []
+    for (algo, _), seeds in groups.items():
+        try:
+            # Every seed in the group has the same algo and tail, so one check covers all.
+            iterations, schedule = _derivation_key(registry, algo, seeds[0])
+        except ValueError as exc:
+            for seed in seeds:
+                results[algo, seed] = DerivationResult(algo, seed, error=str(exc))
+            continue
+        jobs.append((algo, iterations, schedule, seeds))
+
+    backend = _batch_backend(engine, sum(len(seeds) for *_, seeds in jobs))
+    # One call across every group, with each block carrying its group's schedule.
+    schedules: List[KeySchedule] = []
+    flat_seeds: List[bytes] = []
+    for _, _, schedule, seeds in jobs:
+        schedules.extend([schedule] * len(seeds))
+        flat_seeds.extend(seeds)
+    macs = backend.encrypt_macs(schedules, flat_seeds)
+    mac_iter = iter(macs)
+    for algo, iterations, schedule, seeds in jobs:
+        for seed in seeds:
+            results[algo, seed] = DerivationResult(algo, seed, next(mac_iter), iterations,
+                                                   schedule.key, engine=backend.name)
+    return [results[request] for request in requests]
+
+
+def derive_key_all_algos(seed: bytes, algos: Iterable[int] | None = None,
+                         password_map: Mapping[int, str] | PasswordRegistry | None = None,
+                         engine: str | None = None, namespace: str | None = None
+                         ) -> Dict[int, DerivationResult]:
+    """Derive `seed`'s key under every candidate algo at once, keyed by algo.
+
+    ``algos`` defaults to every algo in the map.  Algos without a valid blob,
+    or whose acceptance bitmap rejects the seed's tail byte, are left out; the
+    rest go through one `derive_keys_batch` call, so secrets shared between
+    algos are hashed once and all MACs are encrypted together.
+    """
+    registry = resolve_registry(password_map, namespace)
+    seed = bytes(seed)
+    if len(seed) != 5:
+        raise ValueError("Seed must be exactly 5 bytes")
+    candidates = [(algo, seed) for algo in (registry.algos() if algos is None else algos)
+                  if registry.acceptance(algo)[0] >> seed[4] & 1]
+    return {result.algo: result
+            for result in derive_keys_batch(candidates, registry, engine) if result.ok}
+
+
+def _seed_rows(seeds, algos) -> tuple[memoryview, int, int | Sequence[int]]:
+    """(byte view, row count, algos) for a packed seed buffer, with sizes checked."""
+    seed_view = memoryview(seeds).cast("B")
+    if len(seed_view) % 5:
+        raise ValueError("Seed buffer length must be a multiple of 5")
+    rows = len(seed_view) // 5
+    if not isinstance(algos, int):
+        algos = algos if isinstance(algos, (list, tuple)) else memoryview(algos)
+        if len(algos) != rows:
+            raise ValueError(f"Got {len(algos)} algos for {rows} seeds")
+    return seed_view, rows, algos
+
+
+def _screen_rows(registry: PasswordRegistry, seed_view: memoryview, rows: int,
+                 algos: int | Sequence[int]) -> bytes:
+    if isinstance(algos, int):
+        return bytes(seed_view[4::5]).translate(registry.tail_reasons(algos))
+    numpy = load_numpy()
+    if numpy is None or rows < NUMPY_BATCH_THRESHOLD:
+        tables: Dict[int, bytes] = {}
+        codes = bytearray(rows)
+        for row, (algo, tail) in enumerate(zip(algos, seed_view[4::5])):
+            table = tables.get(algo)
+            if table is None:
+                table = tables[algo] = registry.tail_reasons(algo)
+            codes[row] = table[tail]
+        return bytes(codes)
+    tails = numpy.frombuffer(seed_view, dtype=numpy.uint8)[4::5]
+    algo_rows = numpy.asarray(algos, dtype=numpy.int64)
+    if algo_rows.min() < 0 or algo_rows.max() > 0xFFFF:
+        unique, algo_index = numpy.unique(algo_rows, return_inverse=True)
+    else:
+        # Algo ids are 16-bit, so a dense slot table beats sorting for unique().
+        present = numpy.zeros(0x10000, dtype=bool)
+        present[algo_rows] = True
+        unique = numpy.flatnonzero(present)
+        slots = numpy.zeros(0x10000, dtype=numpy.int64)
+        slots[unique] = numpy.arange(len(unique))
+        algo_index = slots[algo_rows]
+    reason_tables = numpy.frombuffer(
+        b"".join(registry.tail_reasons(algo) for algo in unique.tolist()),
+        dtype=numpy.uint8).reshape(len(unique), 256)
+    return reason_tables[algo_index.reshape(-1), tails].tobytes()
+
+
+def rejection_message(algo: int, seed: bytes,
+                      password_map: Mapping[int, str] | PasswordRegistry | None = None,
+                      namespace: str | None = None) -> str | None:
+    """The ValueError text `derive_key_from_algo` would raise for (algo, seed), or None.
+
+    Runs only the validation, so it costs no hashing.  Turns a rejected row's
+    ``SEED_*`` code back into the message a text batch would have written.
+    """
+    try:
+        iterations_for(resolve_registry(password_map, namespace).record(algo), algo, seed)
+    except ValueError as exc:
+        return str(exc)
+    return None
+
+
+def screen_seeds(seeds, algos: int | Sequence[int],
+                 password_map: Mapping[int, str] | PasswordRegistry | None = None,
+                 namespace: str | None = None) -> bytes:
+    """Pre-validate packed seeds against their algos without hashing anything.
+
+    ``seeds`` and ``algos`` take the same forms as in `derive_keys_into`.
+    Returns one ``SEED_*`` code per row: `SEED_ACCEPTED` (0) for rows a
+    derivation would accept, otherwise the reason it would reject them
+    (``SEED_REJECT_REASONS[code]`` describes it).  Each distinct algo's
+    acceptance bitmap is expanded once into a 256-entry table indexed by tail
+    byte, so a single-algo buffer is one ``bytes.translate`` and a mixed one a
+    NumPy gather when NumPy is importable.
+    """
+    registry = resolve_registry(password_map, namespace)
+    seed_view, rows, algos = _seed_rows(seeds, algos)
+    return _screen_rows(registry, seed_view, rows, algos)
+
+
+# Rows per vectorized chunk in `derive_keys_into`; bounds the (rows, 176)
+# round-key gather to about 11 MB.
+BUFFER_CHUNK_ROWS = 65536
+
+
+def derive_keys_into(seeds, algos: int | Sequence[int], out,
+                     password_map: Mapping[int, str] | PasswordRegistry | None = None,
+                     engine: str | None = None, namespace: str | None = None,
+                     reasons=None) -> bytearray:
+    """Derive MACs for packed seeds straight into a caller-provided buffer.
+
+    ``seeds`` is any C-contiguous buffer (bytes, bytearray, memoryview, mmap,
+    array, NumPy array) holding N rows of 5 seed bytes.  ``algos`` is one
+    algo for every row, or N algos (a list or a buffer such as
+    ``array('H')``).  Row i's MAC is written to ``out[5 * i:5 * i + 5]``.
+    Returns an error bitmap of ``ceil(N / 8)`` bytes: bit ``i % 8`` of byte
+    ``i // 8`` is set when row i was rejected, and that row's output is
+    zeroed.  Pass a writable N-byte ``reasons`` buffer to also receive each
+    row's `screen_seeds` code.
+
+    Rows are screened first, so rejected rows cost no hashing or AES work.
+    Rows sharing an algo and tail byte share one key derivation, exactly as in
+    `derive_keys_batch`.  When the batch goes to the NumPy engine, the
+    buffers are viewed in place and no per-row Python objects are created.
+    """
+    registry = resolve_registry(password_map, namespace)
+    seed_view, rows, algos = _seed_rows(seeds, algos)
+    out_view = memoryview(out).cast("B")
+    if out_view.readonly:
+        raise ValueError("Output buffer must be writable")
+    if len(out_view) < rows * 5:
+        raise ValueError(f"Output buffer needs room for {rows * 5} bytes")
+    if reasons is not None:
+        reasons = memoryview(reasons).cast("B")
+        if reasons.readonly or len(reasons) < rows:
+            raise ValueError(f"Reasons buffer must be writable with room for {rows} bytes")
+    errors = bytearray((rows + 7) // 8)
+    if not rows:
+        return errors
+    codes = _screen_rows(registry, seed_view, rows, algos)
+    if reasons is not None:
+        reasons[:rows] = codes
+    backend = _batch_backend(engine, rows)
+    if backend.name == "numpy":
+        _derive_into_numpy(registry, seed_view, algos, codes, out_view, errors)
+        return errors
+
+    seed_bytes = seed_view.tobytes()
+    groups: Dict[int, List[int]] = {}
+    for row, code in enumerate(codes):
+        if code:
+            errors[row >> 3] |= 1 << (row & 7)
+            out_view[5 * row:5 * row + 5] = bytes(5)
+            continue
+        algo = algos if isinstance(algos, int) else algos[row]
+        groups.setdefault((algo << 8) | seed_bytes[5 * row + 4], []).append(row)
+    for group, members in groups.items():
+        _, schedule = _derivation_key(registry, group >> 8, bytes((0, 0, 0, 0, group & 0xFF)))
+        if backend.batch_native:
+            macs = backend.encrypt_macs([schedule] * len(members),
+                                        [seed_bytes[5 * row:5 * row + 5] for row in members])
+            for row, mac in zip(members, macs):
+                out_view[5 * row:5 * row + 5] = mac
+        else:
+            encrypt_mac = backend.encrypt_mac
+            for row in members:
+                out_view[5 * row:5 * row + 5] = encrypt_mac(schedule,
+                                                            seed_bytes[5 * row:5 * row + 5])
+    return errors
+
+
+def _derive_into_numpy(registry: PasswordRegistry, seed_view: memoryview,
+                       algos: int | Sequence[int], codes: bytes, out_view: memoryview,
+                       errors: bytearray) -> None:
+    numpy = _require_numpy()
+    rows = len(seed_view) // 5
+    seed_rows = numpy.frombuffer(seed_view, dtype=numpy.uint8).reshape(rows, 5)
+    out_rows = numpy.frombuffer(out_view, dtype=numpy.uint8)[:rows * 5].reshape(rows, 5)
+    if isinstance(algos, int):
+        algo_rows = numpy.full(rows, algos, dtype=numpy.int64)
+    else:
+        algo_rows = numpy.asarray(algos, dtype=numpy.int64)
+    row_valid = numpy.frombuffer(codes, dtype=numpy.uint8) == 0
+    groups, row_group = numpy.unique((algo_rows << 8) | seed_rows[:, 4], return_inverse=True)
+    row_group = row_group.reshape(-1)
+    round_keys = numpy.zeros((len(groups), 176), dtype=numpy.uint8)
+    valid = numpy.zeros(len(groups), dtype=bool)
+    valid[row_group[row_valid]] = True
+    for index in numpy.flatnonzero(valid).tolist():
+        group = int(groups[index])
+        _, schedule = _derivation_key(registry, group >> 8, bytes((0, 0, 0, 0, group & 0xFF)))
+        round_keys[index] = numpy.frombuffer(schedule.round_key_bytes(), dtype=numpy.uint8)
+    blocks = numpy.full((min(rows, BUFFER_CHUNK_ROWS), 16), 0xFF, dtype=numpy.uint8)
+    for start in range(0, rows, BUFFER_CHUNK_ROWS):
+        stop = min(start + BUFFER_CHUNK_ROWS, rows)
+        chunk = blocks[:stop - start]
+        chunk[:, 11:] = seed_rows[start:stop]
+        encrypted = aes_encrypt_blocks_numpy(round_keys[row_group[start:stop]], chunk)
+        out_rows[start:stop] = numpy.where(row_valid[start:stop, None], encrypted[:, :5], 0)
+    errors[:] = numpy.packbits(~row_valid, bitorder="little").tobytes()
+
+
+# Binary batch files: fixed-width rows behind a small header, so a batch can
+# be memory-mapped, split into row ranges and derived without any parsing.
+#
+#   header     magic, version, record size, row count
+#   requests   algo (uint16, little-endian) and 5 seed bytes    7 bytes per row
+#   responses  5 MAC bytes and a status byte                    6 bytes per row
+#
+# Response row i answers request row i.  The status is a `screen_seeds` code
+# (`SEED_ACCEPTED` = 0); rejected rows have an all-zero MAC.
+BATCH_REQUEST_MAGIC = b"GM5KREQ\0"
+BATCH_RESPONSE_MAGIC = b"GM5KRSP\0"
+BATCH_FILE_VERSION = 1
+BATCH_FILE_HEADER = struct.Struct("<8sHH4xQ")
+BATCH_REQUEST = struct.Struct("<H5s")
+BATCH_RESPONSE = struct.Struct("<5sB")
+
+
+def write_batch_requests(path: str, pairs: Iterable[tuple[int, bytes]]) -> int:
+    """Write (algo, seed) pairs as a binary request file, returning the row count.
+
+    A pair that does not fit the format raises ValueError naming its row.
+    The file is replaced atomically.
+    """
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    rows = 0
+    try:
+        with open(temp_path, "wb") as handle:
+            handle.write(bytes(BATCH_FILE_HEADER.size))
+            pending = bytearray()
+            for algo, seed in pairs:
+                if not 0 <= algo <= 0xFFFF or len(seed) != 5:
+                    raise ValueError(f"Row {rows}: need a 16-bit algo and a 5-byte seed")
+                pending += BATCH_REQUEST.pack(algo, bytes(seed))
+                rows += 1
+                if len(pending) >= 1 << 20:
+                    handle.write(pending)
+                    pending.clear()
+            handle.write(pending)
+            handle.seek(0)
+            handle.write(BATCH_FILE_HEADER.pack(BATCH_REQUEST_MAGIC, BATCH_FILE_VERSION,
+                                                BATCH_REQUEST.size, rows))
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return rows
+
+
+def create_batch_responses(path: str, rows: int) -> None:
+    """Create a response file for `rows` rows, all zero until derived."""
+    with open(path, "wb") as handle:
+        handle.write(BATCH_FILE_HEADER.pack(BATCH_RESPONSE_MAGIC, BATCH_FILE_VERSION,
+                                            BATCH_RESPONSE.size, rows))
+        handle.truncate(BATCH_FILE_HEADER.size + rows * BATCH_RESPONSE.size)
+
+
+class BatchFile:
+    """Memory-mapped binary request or response file.
+
+    ``kind`` is ``"requests"`` or ``"responses"`` depending on the magic.
+    `records` returns zero-copy views of row ranges; open with
+    ``writable=True`` to fill a response file in place.
+    """
+
+    def __init__(self, path: str, writable: bool = False) -> None:
+        self.path = path
+        self.writable = writable
+        with open(path, "r+b" if writable else "rb") as handle:
+            if os.fstat(handle.fileno()).st_size < BATCH_FILE_HEADER.size:
+                raise ValueError(f"{path} is too short to be a batch file")
+            self._map = mmap.mmap(handle.fileno(), 0,
+                                  access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+        magic, version, record_size, rows = BATCH_FILE_HEADER.unpack_from(self._map, 0)
+        kinds = {BATCH_REQUEST_MAGIC: ("requests", BATCH_REQUEST.size),
+                 BATCH_RESPONSE_MAGIC: ("responses", BATCH_RESPONSE.size)}
+        problem = None
+        if magic not in kinds:
+            problem = "is not a batch file"
+        elif version != BATCH_FILE_VERSION or record_size != kinds[magic][1]:
+            problem = f"has unsupported batch file version {version}"
+        elif len(self._map) != BATCH_FILE_HEADER.size + rows * record_size:
+            problem = "is truncated or has trailing data"
+        if problem:
+            self._map.close()
+            raise ValueError(f"{path} {problem}")
+        self.kind = kinds[magic][0]
+        self.record_size = record_size
+        self.rows = rows
+        self._view = memoryview(self._map)
+
+    def records(self, start: int = 0, stop: int | None = None) -> memoryview:
+        """View of rows ``[start, stop)``, ``record_size`` bytes each."""
+        stop = self.rows if stop is None else min(stop, self.rows)
+        base = BATCH_FILE_HEADER.size
+        return self._view[base + start * self.record_size:base + stop * self.record_size]
+
+    def close(self) -> None:
+        self._view.release()
+        if self.writable:
+            self._map.flush()
+        self._map.close()
+
+
+def batch_request_columns(records) -> tuple[bytearray, array]:
+    """Split packed request rows into a seed buffer and an ``array('H')`` of algos.
+
+    The result is what `derive_keys_into` and `screen_seeds` take; the
+    columns are gathered with strided slice copies, not per-row code.
+    """
+    data = memoryview(records).cast("B")
+    if len(data) % BATCH_REQUEST.size:
+        raise ValueError(f"Request data length must be a multiple of {BATCH_REQUEST.size}")
+    rows = len(data) // BATCH_REQUEST.size
+    seeds = bytearray(5 * rows)
+    for column in range(5):
+        seeds[column::5] = data[2 + column::7]
+    algo_bytes = bytearray(2 * rows)
+    algo_bytes[0::2] = data[0::7]
+    algo_bytes[1::2] = data[1::7]
+    algos = array("H")
+    algos.frombytes(algo_bytes)
+    if sys.byteorder == "big":
+        algos.byteswap()
+    return seeds, algos
+
+
+def derive_batch_file(requests_path: str, responses_path: str,
+                      password_map: Mapping[int, str] | PasswordRegistry | None = None,
+                      engine: str | None = None, namespace: str | None = None,
+                      start: int = 0, stop: int | None = None) -> tuple[int, int]:
+    """Derive request rows ``[start, stop)`` into a response file; returns (rows, errors).
+
+    With the default range the response file is created (or replaced) to
+    match the request file; for a sub-range it must already exist, e.g. from
+    `create_batch_responses`, so several processes can fill disjoint ranges
+    of one file.  Rows go through `derive_keys_into` `BUFFER_CHUNK_ROWS` at a
+    time, so memory does not grow with the file.
+    """
+    registry = resolve_registry(password_map, namespace)
+    requests = BatchFile(requests_path)
+    try:
+        if requests.kind != "requests":
+            raise ValueError(f"{requests_path} is not a request file")
+        total = requests.rows
+        if start == 0 and stop is None:
+            create_batch_responses(responses_path, total)
+        stop = total if stop is None else min(stop, total)
+        responses = BatchFile(responses_path, writable=True)
+        try:
+            if responses.kind != "responses" or responses.rows != total:
+                raise ValueError(f"{responses_path} does not match {requests_path}")
+            errors = 0
+            for first in range(start, stop, BUFFER_CHUNK_ROWS):
+                last = min(first + BUFFER_CHUNK_ROWS, stop)
+                seeds, algos = batch_request_columns(requests.records(first, last))
+                macs = bytearray(5 * (last - first))
+                reasons = bytearray(last - first)
+                derive_keys_into(seeds, algos, macs, registry, engine, reasons=reasons)
+                out = responses.records(first, last)
+                for column in range(5):
+                    out[column::6] = macs[column::5]
+                out[5::6] = reasons
+                out.release()
+                errors += len(reasons) - reasons.count(0)
+        finally:
+            responses.close()
+    finally:
+        requests.close()
+    return max(0, stop - start), errors
+
+
+def read_batch_responses(path: str) -> Iterator[tuple[bytes, int]]:
+    """(mac, status) for every row of a response file, in order."""
+    responses = BatchFile(path)
+    try:
+        if responses.kind != "responses":
+            raise ValueError(f"{path} is not a response file")
+        for first in range(0, responses.rows, BUFFER_CHUNK_ROWS):
+            view = responses.records(first, first + BUFFER_CHUNK_ROWS)
+            rows = BATCH_RESPONSE.iter_unpack(view.tobytes())
+            view.release()
+            yield from rows
+    finally:
+        responses.close()
+
+
+def read_batch_requests(path: str) -> Iterator[tuple[int, bytes]]:
+    """(algo, seed) for every row of a request file, in order."""
+    requests = BatchFile(path)
+    try:
+        if requests.kind != "requests":
+            raise ValueError(f"{path} is not a request file")
+        for first in range(0, requests.rows, BUFFER_CHUNK_ROWS):
+            view = requests.records(first, first + BUFFER_CHUNK_ROWS)
+            rows = BATCH_REQUEST.iter_unpack(view.tobytes())
+            view.release()
+            yield from rows
+    finally:
+        requests.close()
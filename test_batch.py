@@ -0,0 +1,228 @@
+"""Check keylib's buffer batch API and keygen's batch commands against derive_keys_batch."""
+import contextlib
+import io
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from array import array
+
+import keygen
+import keylib
+
+# Fixed so that a failing random request reproduces on every run.
+RANDOM_SEED = 0xBA7C
+# An algo the built-in map has no blob for.
+UNKNOWN_ALGO = 0x1234
+KEYGEN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "keygen.py")
+
+
+def mixed_requests(rng: random.Random, count: int) -> list[tuple[int, bytes]]:
+    """`count` random (algo, seed) pairs; about half get a seed tail their blob accepts."""
+    algos = keylib.DEFAULT_REGISTRY.algos() + [UNKNOWN_ALGO]
+    pairs = []
+    for _ in range(count):
+        algo, tail = rng.choice(algos), rng.randrange(256)
+        bitmap = keylib.DEFAULT_REGISTRY.acceptance(algo)[0]
+        if bitmap and rng.random() < 0.5:
+            while not bitmap >> tail & 1:
+                tail = rng.randrange(256)
+        pairs.append((algo, rng.randbytes(4) + bytes((tail,))))
+    return pairs
+
+
+def write_text_requests(path: str, pairs: list[tuple[int, bytes]]) -> None:
+    with open(path, "w", encoding="utf-8") as handle:
+        handle.writelines(f"{seed.hex()},{algo:#06x}\n" for algo, seed in pairs)
+
+
+def read_bytes(path: str) -> bytes:
+    with open(path, "rb") as handle:
+        return handle.read()
+
+
+class TempDirTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def keygen(self, *argv: str) -> tuple[int, str]:
+        """(exit code, stderr) of an in-process ``keygen.py`` run; stdout is discarded."""
+        stderr = io.StringIO()
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(stderr):
+            code = keygen.main(list(argv))
+        return code, stderr.getvalue()
+
+
+class BufferBatchTest(unittest.TestCase):
+    def engines(self) -> list[str | None]:
+        return [None, "ttable", "bitsliced"] + (["numpy"] if keylib.load_numpy() else [])
+
+    def assert_into_matches_batch(self, pairs: list[tuple[int, bytes]],
+                                  algos: int | array, engine: str | None) -> None:
+        seeds = b"".join(seed for _, seed in pairs)
+        out = bytearray(5 * len(pairs))
+        errors = keylib.derive_keys_into(memoryview(seeds), algos, out, engine=engine)
+        self.assertEqual(len(errors), (len(pairs) + 7) // 8)
+        for row, result in enumerate(keylib.derive_keys_batch(pairs, engine=engine)):
+            self.assertEqual(bytes(out[5 * row:5 * row + 5]), result.mac or bytes(5))
+            self.assertEqual(errors[row >> 3] >> (row & 7) & 1, int(not result.ok))
+
+    def test_mixed_algos_match_batch(self) -> None:
+        self.assertNotIn(UNKNOWN_ALGO, keylib.PASSWORD_MAP)
+        pairs = mixed_requests(random.Random(RANDOM_SEED), 300)
+        for engine in self.engines():
+            with self.subTest(engine=engine):
+                self.assert_into_matches_batch(pairs, array("H", (a for a, _ in pairs)), engine)
+
+    def test_single_algo_matches_batch(self) -> None:
+        rng = random.Random(RANDOM_SEED)
+        algo = rng.choice(keylib.DEFAULT_REGISTRY.algos())
+        pairs = [(algo, rng.randbytes(5)) for _ in range(100)]
+        for engine in self.engines():
+            with self.subTest(engine=engine):
+                self.assert_into_matches_batch(pairs, algo, engine)
+
+    def test_empty_and_short_buffers(self) -> None:
+        self.assertEqual(keylib.derive_keys_into(b"", 0, bytearray()), bytearray())
+        with self.assertRaises(ValueError):
+            keylib.derive_keys_into(bytes(10), 0, bytearray(5))
+        with self.assertRaises(ValueError):
+            keylib.derive_keys_into(bytes(10), 0, bytes(10))
+
+
+# How `derive_keys_batch` words each rejection, mapped to the matching ``SEED_*`` code.
+ERROR_CODES = (("No password blob registered", keylib.SEED_NO_BLOB),
+               ("Algorithm mismatch", keylib.SEED_ALGO_MISMATCH),
+               ("Seed is not allowed", keylib.SEED_BELOW_MIN))
+
+
+def expected_code(result: keylib.DerivationResult) -> int:
+    if result.ok:
+        return keylib.SEED_ACCEPTED
+    for prefix, code in ERROR_CODES:
+        if result.error.startswith(prefix):
+            return code
+    return keylib.SEED_BAD_BLOB
+
+
+class ScreenSeedsTest(unittest.TestCase):
+    def test_reasons_match_batch(self) -> None:
+        rng = random.Random(RANDOM_SEED)
+        # Below the NumPy threshold codes come from per-algo tables, above it from a gather.
+        for count in (keylib.NUMPY_BATCH_THRESHOLD - 1, 400):
+            pairs = mixed_requests(rng, count)
+            seeds = b"".join(seed for _, seed in pairs)
+            algos = [algo for algo, _ in pairs]
+            codes = keylib.screen_seeds(seeds, algos)
+            self.assertEqual(list(codes), [expected_code(result) for result in
+                                           keylib.derive_keys_batch(pairs)])
+            reasons = bytearray(count)
+            errors = keylib.derive_keys_into(seeds, algos, bytearray(5 * count),
+                                             reasons=reasons)
+            self.assertEqual(bytes(reasons), codes)
+            self.assertEqual([errors[row >> 3] >> (row & 7) & 1 for row in range(count)],
+                             [int(code != keylib.SEED_ACCEPTED) for code in codes])
+
+    def test_acceptance_bitmaps_match_validation(self) -> None:
+        registry = keylib.DEFAULT_REGISTRY
+        for algo in registry.algos():
+            record = registry.record(algo)
+            accepted = 0
+            for tail in range(256):
+                try:
+                    keylib.iterations_for(record, algo, bytes((0, 0, 0, 0, tail)))
+                except ValueError:
+                    continue
+                accepted |= 1 << tail
+            self.assertEqual(registry.acceptance(algo)[0], accepted, f"algo {algo:#06x}")
+
+
+class CheckpointResumeTest(TempDirTestCase):
+    def test_killed_run_resumes_byte_identical(self) -> None:
+        requests, output, checkpoint = (self.path(name) for name in
+                                        ("requests.txt", "results.txt", "batch.checkpoint"))
+        write_text_requests(requests, mixed_requests(random.Random(RANDOM_SEED), 60000))
+        straight = subprocess.run([sys.executable, KEYGEN, "batch", requests,
+                                   self.path("straight.txt"), "--jobs", "1"],
+                                  capture_output=True, text=True)
+        command = [sys.executable, KEYGEN, "batch", requests, output, "--jobs", "1",
+                   "--chunk-rows", "500", "--checkpoint", checkpoint, "--checkpoint-every", "0"]
+        process = subprocess.Popen(command, stdout=subprocess.DEVNULL,
+                                   stderr=subprocess.DEVNULL)
+        deadline = time.monotonic() + 30
+        while (not os.path.exists(checkpoint) and process.poll() is None
+               and time.monotonic() < deadline):
+            time.sleep(0.002)
+        process.kill()
+        process.wait()
+        self.assertTrue(os.path.exists(checkpoint), "batch finished before it was killed")
+        # Output written after the last commit must not survive the resume.
+        with open(output, "ab") as handle:
+            handle.write(b"0102030405,0x00")
+        resumed = subprocess.run(command, capture_output=True, text=True)
+        self.assertIn("Resuming at row", resumed.stderr)
+        self.assertEqual(resumed.returncode, straight.returncode)
+        self.assertFalse(os.path.exists(checkpoint))
+        self.assertEqual(read_bytes(output), read_bytes(self.path("straight.txt")))
+
+    def test_non_object_checkpoint_is_rejected(self) -> None:
+        for text in ("[1, 2]", "null", '{"offset": -1}'):
+            with open(self.path("batch.checkpoint"), "w", encoding="utf-8") as handle:
+                handle.write(text)
+            with self.assertRaisesRegex(ValueError, "not a batch checkpoint"):
+                keygen.BatchCheckpoint(self.path("batch.checkpoint"), {}).load()
+
+
+class ConvertTest(TempDirTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.text = self.path("requests.txt")
+        write_text_requests(self.text, mixed_requests(random.Random(RANDOM_SEED), 3000))
+        self.assertEqual(self.keygen("convert", self.text, self.path("requests.bin"))[0], 0)
+
+    def test_text_binary_text_round_trip(self) -> None:
+        self.assertEqual(self.keygen("convert", self.path("requests.bin"),
+                                     self.path("round-trip.txt"))[0], 0)
+        self.assertEqual(read_bytes(self.path("round-trip.txt")), read_bytes(self.text))
+
+    def test_binary_batch_converts_to_text_batch_results(self) -> None:
+        text_code, _ = self.keygen("batch", self.text, self.path("text.res"), "--jobs", "1",
+                                   "--format", "csv")
+        binary_code, _ = self.keygen("batch", self.path("requests.bin"),
+                                     self.path("responses.bin"), "--jobs", "1")
+        self.assertEqual(binary_code, text_code)
+        self.assertEqual(self.keygen("convert", self.path("responses.bin"),
+                                     self.path("binary.res"), "--requests",
+                                     self.path("requests.bin"))[0], 0)
+        self.assertEqual(read_bytes(self.path("binary.res")), read_bytes(self.path("text.res")))
+
+
+class WatchTest(TempDirTestCase):
+    def test_malformed_request_moves_to_failed(self) -> None:
+        inbox = self.path("inbox")
+        os.mkdir(inbox)
+        pairs = mixed_requests(random.Random(RANDOM_SEED), 200)
+        write_text_requests(os.path.join(inbox, "good.req"), pairs)
+        write_text_requests(self.path("good.txt"), pairs)
+        with open(os.path.join(inbox, "bad.req"), "wb") as handle:
+            handle.write(keylib.BATCH_REQUEST_MAGIC + b"truncated")
+        code, stderr = self.keygen("watch", inbox, "--once", "--settle", "0",
+                                   "--poll-interval", "0.01")
+        self.assertEqual(code, 1)
+        self.assertIn("bad.req: failed", stderr)
+        self.assertEqual(sorted(os.listdir(inbox)), ["bad.req.failed", "good.res"])
+        self.keygen("batch", self.path("good.txt"), self.path("good.res"), "--jobs", "1")
+        self.assertEqual(read_bytes(os.path.join(inbox, "good.res")),
+                         read_bytes(self.path("good.res")))
+
+
+if __name__ == "__main__":
+    unittest.main()
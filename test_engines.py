@@ -0,0 +1,260 @@
+"""Cross-check keylib's AES and hash-chain engines against the baseline code paths."""
+import hashlib
+import random
+import unittest
+from typing import Iterator
+
+import keylib
+
+# Fixed so that a failing random vector reproduces on every run.
+RANDOM_SEED = 0x5EED
+
+
+def random_blocks(rng: random.Random, count: int) -> list[tuple[bytes, bytes]]:
+    """`count` random (key, plaintext) pairs."""
+    return [(rng.randbytes(16), rng.randbytes(16)) for _ in range(count)]
+
+
+def random_requests(rng: random.Random, count: int) -> list[tuple[int, bytes]]:
+    """`count` random (algo, seed) pairs from the built-in map that the blob accepts."""
+    algos = keylib.DEFAULT_REGISTRY.algos()
+    pairs: list[tuple[int, bytes]] = []
+    while len(pairs) < count:
+        algo, seed = rng.choice(algos), rng.randbytes(5)
+        if keylib.DEFAULT_REGISTRY.acceptance(algo)[0] >> seed[4] & 1:
+            pairs.append((algo, seed))
+    return pairs
+
+
+def baseline_mac(algo: int, seed: bytes) -> bytes:
+    """The MAC as the original code derived it: a hashlib chain, then round-by-round AES."""
+    record = keylib.parse_password_blob(keylib.PASSWORD_MAP[algo])
+    digest = record.secret
+    for _ in range(keylib.iterations_for(record, algo, seed)):
+        digest = hashlib.sha256(digest).digest()
+    return keylib.aes_encrypt_block_reference(digest[:16], keylib.MAC_BLOCK_PREFIX + seed)[:5]
+
+
+@unittest.skipIf(keylib.load_numpy() is None, "numpy is not installed")
+class NumpyEngineTest(unittest.TestCase):
+    def test_known_answers(self) -> None:
+        numpy = keylib.load_numpy()
+        keys = numpy.frombuffer(b"".join(keylib.KeySchedule(key).round_key_bytes()
+                                         for key, _, _ in keylib.AES_KNOWN_ANSWERS),
+                                dtype=numpy.uint8).reshape(-1, 176)
+        blocks = numpy.frombuffer(b"".join(plain for _, plain, _ in keylib.AES_KNOWN_ANSWERS),
+                                  dtype=numpy.uint8).reshape(-1, 16)
+        self.assertEqual(keylib.aes_encrypt_blocks_numpy(keys, blocks).tobytes(),
+                         b"".join(cipher for _, _, cipher in keylib.AES_KNOWN_ANSWERS))
+
+    def test_random_blocks_match_reference(self) -> None:
+        numpy = keylib.load_numpy()
+        vectors = random_blocks(random.Random(RANDOM_SEED), 64)
+        blocks = numpy.frombuffer(b"".join(block for _, block in vectors),
+                                  dtype=numpy.uint8).reshape(-1, 16)
+        shared = numpy.frombuffer(keylib.KeySchedule(vectors[0][0]).round_key_bytes(),
+                                  dtype=numpy.uint8)
+        self.assertEqual(keylib.aes_encrypt_blocks_numpy(shared, blocks).tobytes(),
+                         b"".join(keylib.aes_encrypt_block_reference(vectors[0][0], block)
+                                  for _, block in vectors))
+        per_row = numpy.frombuffer(b"".join(keylib.KeySchedule(key).round_key_bytes()
+                                            for key, _ in vectors),
+                                   dtype=numpy.uint8).reshape(-1, 176)
+        self.assertEqual(keylib.aes_encrypt_blocks_numpy(per_row, blocks).tobytes(),
+                         b"".join(keylib.aes_encrypt_block_reference(key, block)
+                                  for key, block in vectors))
+
+    def test_batch_derivation_matches_baseline(self) -> None:
+        pairs = random_requests(random.Random(RANDOM_SEED), 2 * keylib.NUMPY_BATCH_THRESHOLD)
+        for result in keylib.derive_keys_batch(pairs, engine="numpy"):
+            self.assertEqual(result.engine, "numpy")
+            self.assertEqual(result.mac, baseline_mac(result.algo, result.seed))
+
+
+class BitslicedEngineTest(unittest.TestCase):
+    def test_known_answers(self) -> None:
+        schedules = [keylib.KeySchedule(key) for key, _, _ in keylib.AES_KNOWN_ANSWERS]
+        self.assertEqual(
+            keylib.aes_encrypt_blocks_bitsliced(
+                schedules, [plain for _, plain, _ in keylib.AES_KNOWN_ANSWERS]),
+            [cipher for _, _, cipher in keylib.AES_KNOWN_ANSWERS])
+
+    def test_random_blocks_match_reference(self) -> None:
+        rng = random.Random(RANDOM_SEED)
+        # The lane layout is built per batch size, so cover one lane and odd counts too.
+        for count in (1, 7, 64):
+            vectors = random_blocks(rng, count)
+            schedules = [keylib.KeySchedule(key) for key, _ in vectors]
+            self.assertEqual(
+                keylib.aes_encrypt_blocks_bitsliced(schedules, [block for _, block in vectors]),
+                [keylib.aes_encrypt_block_reference(key, block) for key, block in vectors])
+
+    def test_batch_derivation_matches_baseline(self) -> None:
+        pairs = random_requests(random.Random(RANDOM_SEED), 48)
+        for result in keylib.derive_keys_batch(pairs, engine="bitsliced"):
+            self.assertEqual(result.engine, "bitsliced")
+            self.assertEqual(result.mac, baseline_mac(result.algo, result.seed))
+
+
+class AesBackendTest(unittest.TestCase):
+    def available_backends(self) -> Iterator[keylib.AesBackend]:
+        """Every registered backend in its own subtest, skipping those this host lacks."""
+        for name, backend in sorted(keylib.AES_BACKENDS.items()):
+            with self.subTest(backend=name):
+                if not backend.available():
+                    self.skipTest(f"{name} is not available on this host")
+                yield backend
+
+    def test_known_answers(self) -> None:
+        for backend in self.available_backends():
+            self.assertIsNone(keylib.check_aes_backend(backend))
+
+    def test_random_blocks_match_reference(self) -> None:
+        vectors = random_blocks(random.Random(RANDOM_SEED), 24)
+        schedules = [keylib.KeySchedule(key) for key, _ in vectors]
+        blocks = [block for _, block in vectors]
+        expected = [keylib.aes_encrypt_block_reference(key, block) for key, block in vectors]
+        seeds = [block[:5] for block in blocks]
+        macs = [keylib.aes_encrypt_block_reference(key, keylib.MAC_BLOCK_PREFIX + seed)[:5]
+                for (key, _), seed in zip(vectors, seeds)]
+        for backend in self.available_backends():
+            self.assertEqual([backend.encrypt_block(schedule, block)
+                              for schedule, block in zip(schedules, blocks)], expected)
+            self.assertEqual(backend.encrypt_blocks(schedules, blocks), expected)
+            self.assertEqual(backend.encrypt_macs(schedules, seeds), macs)
+
+    def test_derivations_match_baseline(self) -> None:
+        pairs = random_requests(random.Random(RANDOM_SEED), 24)
+        expected = [baseline_mac(algo, seed) for algo, seed in pairs]
+        for backend in self.available_backends():
+            self.assertEqual([keylib.derive_key_from_algo(algo, seed, engine=backend.name)[0]
+                              for algo, seed in pairs], expected)
+            results = keylib.derive_keys_batch(pairs, engine=backend.name)
+            self.assertEqual([result.mac for result in results], expected)
+            self.assertEqual({result.engine for result in results}, {backend.name})
+
+    def test_default_engines_match_baseline(self) -> None:
+        rng = random.Random(RANDOM_SEED)
+        for key, block in random_blocks(rng, 8):
+            self.assertEqual(keylib.aes_encrypt_block(key, block),
+                             keylib.aes_encrypt_block_reference(key, block))
+        pairs = random_requests(rng, 8)
+        for algo, seed in pairs:
+            self.assertEqual(keylib.derive_key_from_algo(algo, seed)[0], baseline_mac(algo, seed))
+        for result in keylib.derive_keys_batch(pairs):
+            self.assertIn(result.engine, keylib.AES_BACKENDS)
+            self.assertEqual(result.mac, baseline_mac(result.algo, result.seed))
+
+
+class MacTTableTest(unittest.TestCase):
+    def test_mac_matches_truncated_reference(self) -> None:
+        rng = random.Random(RANDOM_SEED)
+        seeds = [bytes(5), b"\xff" * 5] + [rng.randbytes(5) for _ in range(62)]
+        for key, _ in random_blocks(rng, len(seeds)):
+            schedule = keylib.KeySchedule(key)
+            for seed in (seeds[0], seeds[1], rng.choice(seeds)):
+                self.assertEqual(keylib.encrypt_mac_ttable(schedule, seed),
+                                 keylib.aes_encrypt_block_reference(
+                                     key, keylib.MAC_BLOCK_PREFIX + seed)[:5])
+
+
+class CompiledKeyTest(unittest.TestCase):
+    def test_compiled_functions_match_reference(self) -> None:
+        rng = random.Random(RANDOM_SEED)
+        for key, block in random_blocks(rng, 8):
+            encrypt_block, encrypt_mac = keylib.compile_key_functions(keylib.KeySchedule(key))
+            seed = rng.randbytes(5)
+            self.assertEqual(encrypt_block(block), keylib.aes_encrypt_block_reference(key, block))
+            self.assertEqual(encrypt_mac(seed), keylib.aes_encrypt_block_reference(
+                key, keylib.MAC_BLOCK_PREFIX + seed)[:5])
+
+    def test_promoted_key_serves_ttable_backend(self) -> None:
+        rng = random.Random(RANDOM_SEED)
+        backend = keylib.AES_BACKENDS["ttable"]
+        for key, block in random_blocks(rng, 4):
+            schedule = keylib.KeySchedule(key)
+            keylib.COMPILED_KEYS.promote(schedule)
+            self.addCleanup(keylib.COMPILED_KEYS.discard, key)
+            self.assertIsNotNone(schedule.compiled)
+            seed = rng.randbytes(5)
+            self.assertEqual(backend.encrypt_block(schedule, block),
+                             keylib.aes_encrypt_block_reference(key, block))
+            self.assertEqual(backend.encrypt_mac(schedule, seed),
+                             keylib.aes_encrypt_block_reference(
+                                 key, keylib.MAC_BLOCK_PREFIX + seed)[:5])
+
+
+class FusedTableTest(unittest.TestCase):
+    def test_fused_functions_match_reference(self) -> None:
+        rng = random.Random(RANDOM_SEED)
+        for key, block in random_blocks(rng, 4):
+            encrypt_block, encrypt_mac = keylib.compile_fused_functions(keylib.KeySchedule(key))
+            seed = rng.randbytes(5)
+            self.assertEqual(encrypt_block(block), keylib.aes_encrypt_block_reference(key, block))
+            self.assertEqual(encrypt_mac(seed), keylib.aes_encrypt_block_reference(
+                key, keylib.MAC_BLOCK_PREFIX + seed)[:5])
+
+    def test_fused_tier_answers_before_compiled(self) -> None:
+        tier = keylib.FUSED_TABLES
+        self.addCleanup(tier.configure, tier.budget_bytes, tier.promote_after)
+        tier.configure(budget_bytes=4 * keylib.fused_table_bytes())
+        rng = random.Random(RANDOM_SEED)
+        backend = keylib.AES_BACKENDS["ttable"]
+        for key, block in random_blocks(rng, 2):
+            schedule = keylib.KeySchedule(key)
+            keylib.COMPILED_KEYS.promote(schedule)
+            self.addCleanup(keylib.COMPILED_KEYS.discard, key)
+            self.assertIsNotNone(tier.add(schedule))
+            self.addCleanup(tier.discard, key)
+            self.assertIsNone(schedule.compiled)
+            self.assertIs(keylib._hot_key_functions(schedule), schedule.fused)
+            seed = rng.randbytes(5)
+            self.assertEqual(backend.encrypt_block(schedule, block),
+                             keylib.aes_encrypt_block_reference(key, block))
+            self.assertEqual(backend.encrypt_mac(schedule, seed),
+                             keylib.aes_encrypt_block_reference(
+                                 key, keylib.MAC_BLOCK_PREFIX + seed)[:5])
+
+
+def hashlib_chain(secret: bytes, iterations: int) -> list[bytes]:
+    """Rungs 1..iterations of `secret`'s SHA-256 chain, one hashlib call per rung."""
+    chain = []
+    for _ in range(iterations):
+        secret = hashlib.sha256(secret).digest()
+        chain.append(secret)
+    return chain
+
+
+@unittest.skipIf(keylib.load_numpy() is None, "numpy is not installed")
+class NumpyHashChainTest(unittest.TestCase):
+    def test_lanes_match_hashlib(self) -> None:
+        numpy = keylib.load_numpy()
+        rng = random.Random(RANDOM_SEED)
+        messages = [bytes(32), b"\xff" * 32] + [rng.randbytes(32) for _ in range(30)]
+        states = numpy.frombuffer(b"".join(messages), dtype=">u4").astype(numpy.uint32)
+        digests = keylib.sha256_lanes_numpy(states.reshape(-1, 8)).astype(">u4").tobytes()
+        self.assertEqual(digests, b"".join(hashlib.sha256(message).digest()
+                                           for message in messages))
+
+    def test_chains_match_hashlib(self) -> None:
+        rng = random.Random(RANDOM_SEED)
+        secrets = [rng.randbytes(32) for _ in range(5)]
+        self.assertEqual(keylib.hash_chains_numpy(secrets, 40),
+                         [hashlib_chain(secret, 40) for secret in secrets])
+        self.assertEqual(keylib.hash_chains_numpy(secrets, 0), [[] for _ in secrets])
+
+    def test_precomputed_ladders_match_hashlib(self) -> None:
+        records = keylib.DEFAULT_REGISTRY.records().values()
+        targets = {record.secret: 255 - record.min_seed for record in records}
+        secrets = random.Random(RANDOM_SEED).sample(
+            sorted(secret for secret, height in targets.items() if height), 6)
+        cache = keylib.HashChainCache(checkpoint_interval=3)
+        cache.precompute({secret: targets[secret] for secret in secrets}, "numpy")
+        for secret in secrets:
+            chain = hashlib_chain(secret, targets[secret])
+            for iterations in (1, targets[secret] // 2, targets[secret]):
+                self.assertEqual(cache.digest(secret, iterations), chain[iterations - 1])
+
+
+if __name__ == "__main__":
+    unittest.main()
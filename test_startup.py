@@ -0,0 +1,25 @@
+"""Fail when ``import keygen`` pulls in modules that slow down every run."""
+import os
+import subprocess
+import sys
+import unittest
+
+import bench
+
+# Modules a cold ``keygen.py`` must not import: `re` (via argparse, dataclasses
+# or typing), base64, and the NumPy/ctypes backends that keylib loads lazily.
+FORBIDDEN_IMPORTS = frozenset({"re", "dataclasses", "base64", "typing", "numpy", "ctypes"})
+
+
+class StartupImportTest(unittest.TestCase):
+    def test_import_keygen_skips_heavy_modules(self) -> None:
+        profile = subprocess.run([sys.executable, "-X", "importtime", "-c", "import keygen"],
+                                 capture_output=True, text=True, check=True,
+                                 cwd=os.path.dirname(os.path.abspath(__file__)))
+        modules = {name.strip() for _, name in bench.parse_importtime(profile.stderr)}
+        self.assertIn("keylib", modules)
+        self.assertEqual(sorted(modules & FORBIDDEN_IMPORTS), [])
+
+
+if __name__ == "__main__":
+    unittest.main()